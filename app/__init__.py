@@ -3,21 +3,51 @@
 # ADICIONADO: Configuração do Flask-CORS.
 
 import os
-from functools import wraps
-from flask import Flask, request, jsonify
+import gzip
+import importlib
+import logging
+import hashlib
+import hmac
+from functools import lru_cache
+from decimal import Decimal
+import orjson
+from flask import Flask, Response, request, jsonify, current_app
+from flask.json.provider import JSONProvider
 from flasgger import Swagger
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS # Importa a extensão CORS
+from flask_compress import Compress
+from flask_caching import Cache
+from sqlalchemy.pool import NullPool
 
 # --- Inicialização das Extensões ---
 db = SQLAlchemy()
 migrate = Migrate()
+compress = Compress()
+cache = Cache()
 # Instância do CORS (ainda não vinculada à app)
 # cors = CORS() # Pode inicializar aqui ou diretamente com a app
 
-# Variável global para armazenar a chave de API esperada
-EXPECTED_API_KEY = os.environ.get("API_KEY")
+# Módulos da API que podem ser habilitados via API_MODULES: nome -> (módulo do controller, blueprint)
+API_MODULES = {
+    'clientes': ('cliente_controller', 'cliente_bp'),
+    'produtos': ('produto_controller', 'produto_bp'),
+    'pedidos': ('pedido_controller', 'pedido_bp'),
+}
+
+# Limite de registros por requisição nas rotas de lote (clientes, produtos, pedidos e itens)
+BATCH_MAX = 1000
+# Tamanho do lote de linhas buscado do cursor nas listagens (yield_per)
+YIELD_PER = 500
+
+# Chaves de API aceitas, lidas uma única vez e guardadas em bytes numa tupla.
+# API_KEYS aceita várias chaves separadas por vírgula (ex: uma por parceiro); API_KEY continua valendo.
+API_KEYS = tuple(
+    key
+    for key in (k.strip().encode() for k in (os.environ.get("API_KEYS") or os.environ.get("API_KEY") or "").split(","))
+    if key
+)
 
 # --- Configuração do Swagger (sem alterações) ---
 swagger_config = {
@@ -62,60 +92,223 @@ template = {
 swagger = Swagger(template=template, config=swagger_config)
 
 
-# --- Autenticação por Chave de API (Decorator - sem alterações) ---
-def require_api_key(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        api_key = request.headers.get('X-API-KEY')
-        if not api_key or api_key != EXPECTED_API_KEY:
-            print(f"Tentativa de acesso não autorizado com chave: {api_key}")
-            return jsonify({"message": "Erro: Chave de API inválida ou ausente."}), 401, {'WWW-Authenticate': 'ApiKey realm="API Key Required"'}
-        return f(*args, **kwargs)
-    return decorated_function
+# --- Serialização JSON com orjson ---
+# Chaves não-string (ex: int) são aceitas e datetimes sem fuso são tratados como UTC
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
 
-# --- Fábrica da Aplicação ---
-def create_app():
-    app = Flask(__name__)
+def _orjson_default(obj):
+    """Tipos que o orjson não serializa nativamente (Decimal vira float, como nos to_dict)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+class ORJSONProvider(JSONProvider):
+    """Provider JSON do Flask baseado em orjson (usado por jsonify e request.get_json)."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS).decode()
 
-    # --- Configuração do Banco de Dados com SQLAlchemy (sem alterações) ---
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Gera os bytes diretamente, sem passar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
+        return self._app.response_class(body, mimetype="application/json")
+
+
+# --- Autenticação por Chave de API ---
+def _request_api_key():
+    """Chave enviada na requisição (X-API-KEY ou "Authorization: Bearer <chave>"), em bytes."""
+    # Lê direto do environ WSGI (HTTP_X_API_KEY), sem montar o objeto de headers
+    env = request.environ
+    api_key = env.get('HTTP_X_API_KEY')
+    if api_key is None:
+        auth = env.get('HTTP_AUTHORIZATION', '')
+        if auth[:7].lower() == 'bearer ':
+            api_key = auth[7:].strip()
+    # Strings do environ são latin-1 (PEP 3333): encode('latin-1') devolve os bytes originais
+    return (api_key or '').encode('latin-1')
+
+def _unauthorized():
+    current_app.logger.warning("Tentativa de acesso não autorizado em %s", request.path)
+    return jsonify({"message": "Erro: Chave de API inválida ou ausente."}), 401, {'WWW-Authenticate': 'ApiKey realm="API Key Required"'}
+
+def check_api_key(_keys=API_KEYS):
+    """
+    Hook before_request dos blueprints protegidos: a chave recebida é comparada com
+    hmac.compare_digest contra todas as chaves configuradas, sem parar na primeira que bate,
+    para o tempo de resposta não indicar quanto da chave (nem qual chave) confere.
+    """
+    # O preflight CORS (OPTIONS) é respondido antes, pelo hook _cors_preflight da app
+    api_key = _request_api_key()
+    valida = False
+    for key in _keys:
+        valida |= hmac.compare_digest(api_key, key)
+    if not valida:
+        return _unauthorized()
+    return None
+
+# --- Configuração do Banco de Dados (lida do ambiente uma vez por processo) ---
+@lru_cache(maxsize=1)
+def _database_config():
+    """Monta a URI e as opções do engine a partir das variáveis de ambiente (cacheado: create_app
+    chamado de novo no mesmo processo, ex: em testes ou pelo CLI, não relê o ambiente)."""
     db_user = os.environ.get("DB_USER")
     db_password = os.environ.get("DB_PASSWORD")
     db_host = os.environ.get("DB_HOST")
     db_port = os.environ.get("DB_PORT", 3306)
     db_name = os.environ.get("DB_DATABASE")
-    app.config['SQLALCHEMY_DATABASE_URI'] = \
-        f"mysql+mysqlconnector://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    # Driver MySQL: mysqldb (mysqlclient, binding C) por padrão; pymysql ou mysqlconnector via DB_DRIVER
+    db_driver = os.environ.get("DB_DRIVER", "mysqldb")
+    database_uri = f"mysql+{db_driver}://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4"
+    # Pool de conexões: reaproveita conexões entre requisições em vez de abrir uma nova a cada vez.
+    # pool_pre_ping descarta conexões mortas ("MySQL server has gone away") antes de usá-las e
+    # pool_recycle fica abaixo do wait_timeout padrão do MySQL.
+    if os.environ.get("DB_POOL") == "null":
+        # Sem pool (fecha a conexão ao fim de cada uso), útil atrás de um pooler externo
+        return database_uri, {'poolclass': NullPool}
+    return database_uri, {
+        'pool_size': int(os.environ.get("DB_POOL_SIZE", 10)),
+        'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'pool_timeout': 30,
+    }
+
+# --- Fábrica da Aplicação ---
+def create_app():
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+
+    # --- Configuração do Banco de Dados com SQLAlchemy ---
+    database_uri, engine_options = _database_config()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(engine_options)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ECHO'] = os.environ.get('FLASK_DEBUG') == '1'
+    # Log de SQL só em debug e se pedido explicitamente (SQL_ECHO=1): o echo formata e escreve
+    # cada query no stderr. Desligado, o logger do engine fica em WARNING para nem formatar.
+    app.config['SQLALCHEMY_ECHO'] = app.debug and os.environ.get('SQL_ECHO') == '1'
+    if not app.config['SQLALCHEMY_ECHO']:
+        logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+
+    # --- Compressão das respostas (Brotli, com gzip como alternativa) ---
+    # Respostas JSON (principalmente as listagens) ficam 5-10x menores; abaixo de 500 bytes não compensa.
+    # Flask-Compress adiciona "Vary: Accept-Encoding" e também comprime as respostas em streaming.
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_ALGORITHM_STREAMING'] = ['br', 'gzip']
+    app.config['COMPRESS_BR_LEVEL'] = 4
+    app.config['COMPRESS_LEVEL'] = 4
+    app.config['COMPRESS_MIN_SIZE'] = 500
+
+    # --- Cache em memória (Flask-Caching) ---
+    # Guarda o resultado da listagem de produtos e das contagens; as escritas invalidam
+    # o cache do processo e o timeout limita a defasagem entre workers.
+    app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+    app.config['CACHE_DEFAULT_TIMEOUT'] = int(os.environ.get('CACHE_TIMEOUT', 30))
 
     # --- Inicializa as Extensões com a App ---
     db.init_app(app)
     migrate.init_app(app, db)
     swagger.init_app(app)
+    compress.init_app(app)
+    cache.init_app(app)
 
     # --- Inicializa o CORS ---
     # Permite requisições de qualquer origem para todas as rotas da API que começam com /api/
     # Em produção, substitua "*" pela lista de origens permitidas (ex: ['[http://parceiro1.com](http://parceiro1.com)', '[https://parceiro2.com](https://parceiro2.com)'])
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
-    # Opções mais detalhadas:
-    # CORS(app, resources={r"/api/*": {
-    #     "origins": ["http://localhost:3000", "[https://meufrontend.com](https://meufrontend.com)"], # Lista de origens permitidas
-    #     "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"], # Métodos permitidos
-    #     "allow_headers": ["Content-Type", "X-API-KEY", "Authorization"] # Cabeçalhos permitidos
-    # }})
+    # max_age: o navegador guarda o resultado do preflight (OPTIONS) por 24h, evitando
+    # um OPTIONS extra antes de cada requisição (Chrome limita a 2h, Firefox a 24h).
+    # send_wildcard: responde "Access-Control-Allow-Origin: *" sem ecoar a origem (e sem "Vary: Origin").
+    cors_options = {
+        "origins": "*",
+        "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "X-API-KEY", "Authorization"],
+        "max_age": 86400,
+        "send_wildcard": True,
+    }
+    CORS(app, resources={r"/api/*": cors_options})
+
+    # Preflight (OPTIONS) das rotas da API respondido logo no primeiro hook, com cabeçalhos
+    # montados uma vez: não passa pelos hooks dos blueprints (chave de API) nem pela view.
+    # O Flask-CORS não sobrescreve respostas que já trazem Access-Control-Allow-Origin.
+    preflight_headers = {
+        'Access-Control-Allow-Origin': cors_options["origins"],
+        'Access-Control-Allow-Methods': ", ".join(cors_options["methods"]),
+        'Access-Control-Allow-Headers': ", ".join(cors_options["allow_headers"]),
+        'Access-Control-Max-Age': str(cors_options["max_age"]),
+    }
 
+    @app.before_request
+    def _cors_preflight():
+        # url_rule None: rota inexistente, segue o fluxo normal (404/405)
+        if request.method == 'OPTIONS' and request.url_rule is not None and request.path.startswith('/api/'):
+            return '', 204, preflight_headers
+        return None
+
+
+    # --- Tratamento centralizado dos erros levantados pelos serviços ---
+    from .errors import APIError
+
+    @app.errorhandler(APIError)
+    def _handle_api_error(e):
+        if e.code >= 500:
+            app.logger.error("Erro interno em %s: %s", request.path, e.message)
+        return Response(orjson.dumps({"message": e.message}), status=e.code, mimetype='application/json')
+
+    # --- Cache da especificação Swagger (/apispec_1.json) ---
+    # O flasgger percorre todos os @swag_from a cada requisição da spec. Como ela não muda com a
+    # app rodando, a primeira resposta é guardada (com ETag e versão gzip) e reaproveitada.
+    spec_route = swagger_config["specs"][0]["route"]
+    spec_cache = {}
+
+    @app.before_request
+    def _serve_cached_spec():
+        if request.path != spec_route or not spec_cache:
+            return None
+        if spec_cache['etag'] in request.if_none_match:
+            response = Response(status=304)
+        elif 'gzip' in request.accept_encodings:
+            response = Response(spec_cache['gzip'], mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(spec_cache['body'], mimetype='application/json')
+        response.set_etag(spec_cache['etag'])
+        response.headers['Cache-Control'] = 'public, max-age=300, must-revalidate'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def _store_spec(response):
+        if request.path == spec_route and not spec_cache and response.status_code == 200:
+            body = response.get_data()
+            spec_cache['body'] = body
+            spec_cache['gzip'] = gzip.compress(body, 6)
+            spec_cache['etag'] = hashlib.blake2b(body, digest_size=16).hexdigest()
+            response.set_etag(spec_cache['etag'])
+            response.headers['Cache-Control'] = 'public, max-age=300, must-revalidate'
+            response.vary.add('Accept-Encoding')
+        return response
 
     # --- Importa os Models (sem alterações) ---
     from .models import cliente, produto, pedido, pedido_produto # noqa
 
-    # --- Registro dos Blueprints (sem alterações) ---
-    from .controllers.cliente_controller import cliente_bp
-    from .controllers.produto_controller import produto_bp
-    from .controllers.pedido_controller import pedido_bp
-
-    app.register_blueprint(cliente_bp, url_prefix='/api/clientes')
-    app.register_blueprint(produto_bp, url_prefix='/api/produtos')
-    app.register_blueprint(pedido_bp, url_prefix='/api/pedidos')
+    # --- Registro dos Blueprints ---
+    # Aceita "/api/clientes" e "/api/clientes/" sem o redirect 308 do Werkzeug
+    # (que custaria uma ida e volta extra, mais um preflight CORS para a nova URL).
+    app.url_map.strict_slashes = False
+    # API_MODULES permite subir só parte da API (ex: "clientes"); controllers fora da lista
+    # nem são importados (menos memória por worker). Os models são sempre importados acima,
+    # pois os relacionamentos entre eles precisam de todas as classes.
+    modules = os.environ.get("API_MODULES", "clientes,produtos,pedidos")
+    for name in filter(None, (m.strip() for m in modules.split(','))):
+        if name not in API_MODULES:
+            raise ValueError(f"Módulo de API desconhecido em API_MODULES: '{name}'")
+        module_name, bp_name = API_MODULES[name]
+        module = importlib.import_module(f'.controllers.{module_name}', __package__)
+        app.register_blueprint(getattr(module, bp_name), url_prefix=f'/api/{name}')
 
     # --- Rotas de Verificação (sem alterações) ---
     @app.route('/')
@@ -0,0 +1,152 @@
+# ./app/controllers/_http.py
+# Funções auxiliares de requisição/resposta compartilhadas pelos controllers (JSON via orjson).
+
+import hashlib
+from datetime import datetime, timezone
+import fastjsonschema
+import orjson
+from flask import Response, request
+
+def json_body():
+    """Lê o corpo JSON da requisição com orjson. Retorna None se vazio ou inválido."""
+    raw = request.get_data(cache=False)
+    if not raw:
+        return None
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+
+# Resposta de erro mais comum, serializada uma única vez no import: (corpo, status)
+BAD_JSON = (orjson.dumps({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400)
+BAD_BATCH = (orjson.dumps({"message": "Erro: O corpo da requisição deve ser uma lista JSON não vazia."}), 400)
+
+def prebuilt_response(pair):
+    """Monta a Response de um erro pré-serializado."""
+    body, status = pair
+    return Response(body, status=status, mimetype='application/json')
+
+def json_response(payload, status=200):
+    """Serializa a resposta diretamente com orjson, sem passar pelo jsonify."""
+    return Response(orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS), status=status, mimetype='application/json')
+
+def body_etag(body):
+    """ETag forte de um corpo de resposta já serializado."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def conditional_body_response(body, etag):
+    """Resposta 200 para um corpo já serializado; vira 304 se o If-None-Match do cliente bater."""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def conditional_json_response(payload):
+    """Resposta 200 com ETag forte (hash do corpo); vira 304 se o If-None-Match do cliente bater."""
+    body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return conditional_body_response(body, body_etag(body))
+
+def count_response(key, count):
+    """
+    Resposta das rotas /count com o total também no cabeçalho X-Total-Count.
+    Em HEAD (polling de dashboards) só os cabeçalhos são montados, sem serializar o corpo.
+    """
+    if request.method == 'HEAD':
+        response = Response(status=200, mimetype='application/json')
+    else:
+        response = conditional_json_response({key: count})
+    response.headers['X-Total-Count'] = str(count)
+    response.headers['Cache-Control'] = 'private, max-age=5'
+    return response
+
+def last_modified_response(payload):
+    """
+    Resposta 200 com Last-Modified (campo data_atualizacao do payload). Se o If-Modified-Since
+    do cliente já cobre essa data, responde 304 sem serializar o corpo.
+    """
+    updated = payload.get('data_atualizacao')
+    if not updated:
+        return json_response(payload)
+    # HTTP-date tem resolução de segundos
+    last_modified = datetime.fromisoformat(updated).replace(microsecond=0, tzinfo=timezone.utc)
+    since = request.if_modified_since
+    if since is not None and last_modified <= since:
+        response = Response(status=304)
+    else:
+        response = json_response(payload)
+    response.last_modified = last_modified
+    return response
+
+def stream_json_array(rows):
+    """Gera um array JSON item a item, sem montar a lista inteira (nem o JSON) em memória."""
+    sep = b'['
+    for row in rows:
+        yield sep + orjson.dumps(row)
+        sep = b','
+    yield b']' if sep == b',' else b'[]'
+
+# --- Montagem de views ---
+
+def swag_spec(spec):
+    """
+    Equivale a @swag_from(dict) para a documentação: anexa a spec à view (lida pelo flasgger
+    ao gerar /apispec_1.json), mas sem o wrapper que o swag_from executa a cada requisição.
+    """
+    def decorator(view):
+        view.specs_dict = spec
+        return view
+    return decorator
+
+def _json_schema(schema, property_types):
+    """
+    Cópia do schema do Swagger em JSON Schema: 'nullable' vira o tipo null e 'format' (ex: email)
+    fica só na documentação, sem ser validado (a API nunca recusou um email por formato).
+    """
+    schema = dict(schema)
+    schema.pop("format", None)
+    if schema.pop("nullable", False) and isinstance(schema.get("type"), str):
+        schema["type"] = [schema["type"], "null"]
+    if "properties" in schema:
+        schema["properties"] = {
+            name: dict(_json_schema(prop, {}), type=property_types[name]) if name in property_types
+            else _json_schema(prop, {})
+            for name, prop in schema["properties"].items()
+        }
+    if isinstance(schema.get("items"), dict):
+        schema["items"] = _json_schema(schema["items"], {})
+    return schema
+
+def body_validator(schema, **property_types):
+    """
+    Compila (uma vez, no import) um validador fastjsonschema a partir do schema de entrada do Swagger.
+    property_types substitui o tipo de propriedades que aceitam mais de uma forma (ex: valor=['string', 'number']).
+    """
+    return fastjsonschema.compile(_json_schema(schema, property_types))
+
+def validation_error(exc):
+    """Resposta 400 para um corpo rejeitado pelo validador."""
+    return json_response({"message": f"Erro de validação: {exc.message}"}, 400)
+
+def body_view(name, service, spec, status=200, validate=None):
+    """
+    Monta a view de uma rota que recebe corpo JSON: lê o corpo, valida (se houver validador),
+    chama service(*parâmetros_da_url, dados) e responde com o status de sucesso.
+    Erros do serviço (APIError) seguem para o handler da app.
+    """
+    _json_body, _bad_json, _prebuilt, _json_response = json_body, BAD_JSON, prebuilt_response, json_response
+    _invalid, _validation_error = fastjsonschema.JsonSchemaException, validation_error
+
+    def view(**url_params):
+        data = _json_body()
+        if not data:
+            return _prebuilt(_bad_json)
+        if validate is not None:
+            try:
+                validate(data)
+            except _invalid as e:
+                return _validation_error(e)
+        # Flask repassa os parâmetros na ordem em que aparecem na URL
+        return _json_response(service(*url_params.values(), data), status)
+
+    view.__name__ = view.__qualname__ = name
+    view.specs_dict = spec
+    return view
@@ -0,0 +1,17 @@
+# ./app/controllers/_schemas.py
+# Schemas do Swagger compartilhados entre os controllers (uma única instância de cada).
+
+ERROR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "message": {"type": "string", "description": "Mensagem de erro"}
+    }
+}
+
+BATCH_ERROR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "indice": {"type": "integer", "description": "Posição do registro no lote enviado"},
+        "message": {"type": "string", "description": "Mensagem de erro"}
+    }
+}
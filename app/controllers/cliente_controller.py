@@ -1,13 +1,17 @@
 # ./app/controllers/cliente_controller.py
 # Define os endpoints da API REST para Cliente, incluindo o campo email.
 
-from flask import Blueprint, request, jsonify
-from flasgger import swag_from
+from flask import Blueprint, Response, request, stream_with_context
+from app.controllers._schemas import ERROR_SCHEMA, BATCH_ERROR_SCHEMA
+from app.controllers._http import (
+    json_body, BAD_BATCH, prebuilt_response, json_response, stream_json_array, swag_spec, body_view, count_response
+)
 from app.services.cliente_service import (
     get_all_clientes_service,
     count_clientes_service,
     get_cliente_by_id_service,
     create_cliente_service,
+    create_clientes_batch_service,
     update_cliente_service,
     patch_cliente_service,
     delete_cliente_service
@@ -65,66 +69,40 @@ CLIENTE_PATCH_SCHEMA = {
     "minProperties": 1
 }
 
-ERROR_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "message": {"type": "string", "description": "Mensagem de erro"}
-    }
-}
+# --- Specs do Swagger (definidas uma vez no import e reutilizadas pelos decorators) ---
 
-# --- Endpoints da API ---
+# Parâmetros de filtro compartilhados entre a listagem e a contagem
+_FILTER_NOME = {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False}
+_FILTER_CPF = {'name': 'cpf', 'in': 'query', 'type': 'string', 'required': False}
+_FILTER_TELEFONE = {'name': 'telefone', 'in': 'query', 'type': 'string', 'required': False}
+_FILTER_ENDERECO = {'name': 'endereco', 'in': 'query', 'type': 'string', 'required': False}
+_FILTER_EMAIL = {'name': 'email', 'in': 'query', 'type': 'string', 'required': False}
+_FILTER_PARAMS = [_FILTER_NOME, _FILTER_CPF, _FILTER_TELEFONE, _FILTER_ENDERECO, _FILTER_EMAIL]
+_COUNT_FILTER_PARAMS = [_FILTER_NOME, _FILTER_CPF, _FILTER_EMAIL] # Adicionar outros filtros se necessário
 
-@cliente_bp.route('', methods=['GET'])
-@swag_from({
+GET_ALL_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Lista ou filtra clientes',
     'description': 'Retorna lista de clientes. Filtra por nome, cpf, telefone, endereco, email.',
-    'parameters': [
-        {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'cpf', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'telefone', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'endereco', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'email', 'in': 'query', 'type': 'string', 'required': False} # Adiciona filtro email
-    ],
+    'parameters': _FILTER_PARAMS,
     'responses': {
         '200': {'description': 'Lista de clientes.', 'schema': {'type': 'array', 'items': CLIENTE_SCHEMA}},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_all_clientes():
-    """ Rota GET /api/clientes """
-    filters = {k: v for k, v in request.args.items() if v}
-    clientes, error = get_all_clientes_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify(clientes), 200
+}
 
-@cliente_bp.route('/count', methods=['GET'])
-@swag_from({
+COUNT_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Conta clientes',
     'description': 'Retorna quantidade total de clientes, com filtros opcionais.',
-    'parameters': [
-        {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'cpf', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'email', 'in': 'query', 'type': 'string', 'required': False} # Adiciona filtro email
-        # Adicionar outros filtros se necessário
-    ],
+    'parameters': _COUNT_FILTER_PARAMS,
     'responses': {
-        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_clientes': {'type': 'integer'}}}},
+        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_clientes': {'type': 'integer'}}}, 'headers': {'X-Total-Count': {'type': 'integer', 'description': 'Total (também enviado em HEAD, sem corpo)'}}},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def count_clientes():
-    """ Rota GET /api/clientes/count """
-    filters = {k: v for k, v in request.args.items() if v}
-    count, error = count_clientes_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify({"total_clientes": count}), 200
+}
 
-@cliente_bp.route('/<int:cliente_id>', methods=['GET'])
-@swag_from({
+GET_BY_ID_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Busca cliente por ID',
     'parameters': [{'name': 'cliente_id', 'in': 'path', 'type': 'integer', 'required': True}],
@@ -133,18 +111,9 @@ def count_clientes():
         '404': {'description': 'Cliente não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_cliente(cliente_id):
-    """ Rota GET /api/clientes/{id} """
-    cliente, error = get_cliente_by_id_service(cliente_id)
-    if error:
-        return jsonify({"message": error}), 500
-    if not cliente:
-        return jsonify({"message": "Erro: Cliente não encontrado."}), 404
-    return jsonify(cliente), 200
+}
 
-@cliente_bp.route('', methods=['POST'])
-@swag_from({
+CREATE_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Cria novo cliente',
     'parameters': [{'name': 'body', 'in': 'body', 'required': True, 'schema': CLIENTE_INPUT_SCHEMA}], # Schema já inclui email
@@ -153,24 +122,27 @@ def get_cliente(cliente_id):
         '400': {'description': 'Erro na requisição (dados inválidos/faltando, CPF/Email duplicado).', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def create_cliente():
-    """ Rota POST /api/clientes """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    cliente, error = create_cliente_service(data)
+}
 
-    if error:
-        # Erros de validação ou duplicação (CPF/Email) são 400
-        if "obrigatórios" in error or "CPF" in error or "Email" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    return jsonify(cliente), 201
+BATCH_SPEC = {
+    'tags': ['Clientes'],
+    'summary': 'Cria clientes em lote',
+    'description': 'Cria vários clientes em uma única transação. Itens inválidos (ou com CPF/Email já cadastrado ou repetido no lote) são retornados em "erros" com o índice no lote; os demais são criados. Retorna 201 se ao menos um cliente foi criado.',
+    'parameters': [{'name': 'body', 'in': 'body', 'required': True, 'schema': {'type': 'array', 'items': CLIENTE_INPUT_SCHEMA}}],
+    'responses': {
+        '201': {'description': 'Lote processado (ao menos um cliente criado).', 'schema': {
+            'type': 'object',
+            'properties': {
+                'criados': {'type': 'array', 'items': CLIENTE_SCHEMA},
+                'erros': {'type': 'array', 'items': BATCH_ERROR_SCHEMA}
+            }
+        }},
+        '400': {'description': 'Corpo inválido, lote acima do limite ou nenhum cliente válido.', 'schema': ERROR_SCHEMA},
+        '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
+    }
+}
 
-@cliente_bp.route('/<int:cliente_id>', methods=['PUT'])
-@swag_from({
+PUT_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Atualiza cliente (substituição completa)',
     'parameters': [
@@ -183,28 +155,9 @@ def create_cliente():
         '404': {'description': 'Cliente não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def update_cliente(cliente_id):
-    """ Rota PUT /api/clientes/{id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    cliente, error = update_cliente_service(cliente_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        # Erros de validação ou duplicação (CPF/Email) são 400
-        if "devem ser enviados" in error or "CPF" in error or "Email" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not cliente:
-        return jsonify({"message": "Erro: Cliente não encontrado."}), 404
-    return jsonify(cliente), 200
+}
 
-@cliente_bp.route('/<int:cliente_id>', methods=['PATCH'])
-@swag_from({
+PATCH_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Atualiza parcialmente cliente',
     'parameters': [
@@ -217,29 +170,9 @@ def update_cliente(cliente_id):
         '404': {'description': 'Cliente não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def patch_cliente(cliente_id):
-    """ Rota PATCH /api/clientes/{id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    cliente, error = patch_cliente_service(cliente_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        # Erros de validação ou duplicação (CPF/Email) são 400
-        if "Nenhum dado" in error or "Nenhum campo válido" in error or "CPF" in error or "Email" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not cliente:
-        return jsonify({"message": "Erro: Cliente não encontrado."}), 404
-    return jsonify(cliente), 200
+}
 
-# Rota DELETE não precisa de alteração no schema ou lógica principal
-@cliente_bp.route('/<int:cliente_id>', methods=['DELETE'])
-@swag_from({
+DELETE_SPEC = {
     'tags': ['Clientes'],
     'summary': 'Deleta cliente por ID',
     'parameters': [{'name': 'cliente_id', 'in': 'path', 'type': 'integer', 'required': True}],
@@ -249,17 +182,68 @@ def patch_cliente(cliente_id):
         '400': {'description': 'Erro ao deletar (dependências).', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def delete_cliente(cliente_id):
-    """ Rota DELETE /api/clientes/{id} """
-    result, error = delete_cliente_service(cliente_id)
+}
+
+# --- Funções Auxiliares ---
+
+# Filtros aceitos pelas rotas de listagem/contagem (parâmetros desconhecidos são ignorados)
+_CLIENTE_FILTERS = ('nome', 'cpf', 'telefone', 'endereco', 'email')
+_COUNT_FILTERS = ('nome', 'cpf', 'email')
+
+# --- Endpoints da API ---
+# Rotas que só leem o corpo JSON e chamam o serviço são montadas por body_view (ver _http.py)
+# Os serviços entram como argumento padrão (_svc): acesso local em vez de busca global a cada requisição
+
+@cliente_bp.route('', methods=['GET'])
+@swag_spec(GET_ALL_SPEC)
+def get_all_clientes(_svc=get_all_clientes_service):
+    """ Rota GET /api/clientes """
+    args = request.args
+    filters = {k: v for k in _CLIENTE_FILTERS if (v := args.get(k))}
+    clientes = _svc(filters)
+    return Response(stream_with_context(stream_json_array(clientes)), mimetype='application/json')
+
+@cliente_bp.route('/count', methods=['GET', 'HEAD'])
+@swag_spec(COUNT_SPEC)
+def count_clientes(_svc=count_clientes_service):
+    """ Rota GET|HEAD /api/clientes/count """
+    args = request.args
+    filters = {k: v for k in _COUNT_FILTERS if (v := args.get(k))}
+    return count_response("total_clientes", _svc(filters))
+
+@cliente_bp.route('/<int:cliente_id>', methods=['GET'])
+@swag_spec(GET_BY_ID_SPEC)
+def get_cliente(cliente_id, _svc=get_cliente_by_id_service):
+    """ Rota GET /api/clientes/{id} """
+    return json_response(_svc(cliente_id))
+
+# Rota POST /api/clientes
+create_cliente = body_view('create_cliente', create_cliente_service, CREATE_SPEC, 201)
+cliente_bp.add_url_rule('', view_func=create_cliente, methods=['POST'])
+
+@cliente_bp.route('/batch', methods=['POST'])
+@swag_spec(BATCH_SPEC)
+def create_clientes_batch():
+    """ Rota POST /api/clientes/batch """
+    data = json_body()
+    if not data or not isinstance(data, list):
+        return prebuilt_response(BAD_BATCH)
 
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Não é possível excluir" in error or "registros dependentes" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not result:
-        return jsonify({"message": "Erro: Cliente não encontrado."}), 404
-    return jsonify(result), 200
+    result = create_clientes_batch_service(data)
+    # 201 se algo foi criado; se todos os itens falharam, 400 com a lista de erros
+    return json_response(result, 201 if result["criados"] else 400)
+
+# Rota PUT /api/clientes/{id}
+update_cliente = body_view('update_cliente', update_cliente_service, PUT_SPEC)
+cliente_bp.add_url_rule('/<int:cliente_id>', view_func=update_cliente, methods=['PUT'])
+
+# Rota PATCH /api/clientes/{id}
+patch_cliente = body_view('patch_cliente', patch_cliente_service, PATCH_SPEC)
+cliente_bp.add_url_rule('/<int:cliente_id>', view_func=patch_cliente, methods=['PATCH'])
+
+# Rota DELETE não precisa de alteração no schema ou lógica principal
+@cliente_bp.route('/<int:cliente_id>', methods=['DELETE'])
+@swag_spec(DELETE_SPEC)
+def delete_cliente(cliente_id, _svc=delete_cliente_service):
+    """ Rota DELETE /api/clientes/{id} """
+    return json_response(_svc(cliente_id))
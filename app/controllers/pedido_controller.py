@@ -1,33 +1,31 @@
 # ./app/controllers/pedido_controller.py
 # Define os endpoints da API REST para a entidade Pedido.
 
-from flask import Blueprint, request, jsonify
-from flasgger import swag_from
-from app import require_api_key
+import orjson
+from flask import Blueprint, Response, request, stream_with_context
+from app import check_api_key # Hook de autenticação por chave de API
+from app.controllers._schemas import ERROR_SCHEMA, BATCH_ERROR_SCHEMA
+from app.controllers._http import (
+    json_body, BAD_BATCH, prebuilt_response, json_response,
+    stream_json_array, swag_spec, body_view, count_response, body_validator, last_modified_response
+)
 from app.services.pedido_service import (
     create_pedido_service,
     get_all_pedidos_service,
     count_pedidos_service,
     get_pedido_by_id_service,
     add_item_to_pedido_service,
+    add_items_to_pedido_service,
     update_item_in_pedido_service,
     remove_item_from_pedido_service,
     patch_pedido_service,
-    delete_pedido_service
+    delete_pedido_service,
+    create_pedidos_batch_service
 )
-# Importa schemas de outros controllers se necessário ou define aqui
-# from .cliente_controller import ERROR_SCHEMA
-
-# Define ERROR_SCHEMA aqui se não for importar
-ERROR_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "message": {"type": "string", "description": "Mensagem de erro"}
-    }
-}
-
 
 pedido_bp = Blueprint('pedido_bp', __name__)
+# Todas as rotas do blueprint exigem a chave de API
+pedido_bp.before_request(check_api_key)
 
 # --- Definições de Schema para Swagger ---
 
@@ -45,9 +43,9 @@ PEDIDO_INPUT_SCHEMA = {
     "required": ["cliente_id", "itens"],
     "properties": {
         "cliente_id": {"type": "integer", "description": "ID do cliente que está fazendo o pedido"},
-        "endereco_entrega": {"type": "string", "description": "Endereço de entrega (opcional, usa do cliente se omitido)"},
-        "telefone_contato": {"type": "string", "description": "Telefone de contato para o pedido (opcional, usa do cliente se omitido)"},
-        "email_pedido": {"type": "string", "format": "email", "description": "Email para o pedido (opcional, usa do cliente se omitido)"},
+        "endereco_entrega": {"type": "string", "description": "Endereço de entrega (opcional, usa do cliente se omitido)", "nullable": True},
+        "telefone_contato": {"type": "string", "description": "Telefone de contato para o pedido (opcional, usa do cliente se omitido)", "nullable": True},
+        "email_pedido": {"type": "string", "format": "email", "description": "Email para o pedido (opcional, usa do cliente se omitido)", "nullable": True},
         "itens": {
             "type": "array",
             "description": "Lista de itens do pedido",
@@ -73,6 +71,7 @@ PEDIDO_OUTPUT_SCHEMA = {
     "properties": {
         "id": {"type": "integer"},
         "data_criacao": {"type": "string", "format": "date-time"},
+        "data_atualizacao": {"type": "string", "format": "date-time"},
         "cliente_id": {"type": "integer"},
         "nome_cliente": {"type": "string"},
         "cpf_cliente": {"type": "string"},
@@ -84,16 +83,17 @@ PEDIDO_OUTPUT_SCHEMA = {
         "itens": { # Opcional, incluído se solicitado
             "type": "array",
             "items": PEDIDO_ITEM_OUTPUT_SCHEMA
-        }
+        },
+        "cliente_atual": {"type": "object", "description": "Dados atuais do cliente (opcional, incluído se solicitado)"}
     }
 }
 
 PEDIDO_PATCH_SCHEMA = {
     "type": "object",
     "properties": {
-        "endereco_entrega": {"type": "string", "description": "Novo endereço de entrega"},
-        "telefone_contato": {"type": "string", "description": "Novo telefone de contato"},
-        "email_pedido": {"type": "string", "format": "email", "description": "Novo email para o pedido"}
+        "endereco_entrega": {"type": "string", "description": "Novo endereço de entrega", "nullable": True},
+        "telefone_contato": {"type": "string", "description": "Novo telefone de contato", "nullable": True},
+        "email_pedido": {"type": "string", "format": "email", "description": "Novo email para o pedido", "nullable": True}
     },
     "minProperties": 1
 }
@@ -106,12 +106,24 @@ ITEM_UPDATE_SCHEMA = {
     }
 }
 
+# Validadores do corpo gerados a partir dos schemas acima (compilados uma vez, no import)
+_validate_pedido_in = body_validator(PEDIDO_INPUT_SCHEMA)
+_validate_pedido_patch = body_validator(PEDIDO_PATCH_SCHEMA)
+_validate_item_in = body_validator(PEDIDO_ITEM_INPUT_SCHEMA)
+_validate_item_update = body_validator(ITEM_UPDATE_SCHEMA)
 
-# --- Endpoints da API ---
+# Filtros aceitos pelas rotas de listagem/contagem (parâmetros desconhecidos são ignorados)
+_PEDIDO_FILTERS = ('cliente_id', 'data_inicio', 'data_fim')
+# Valores aceitos como verdadeiro em parâmetros booleanos (busca no set, sem .lower() por requisição)
+_TRUE = frozenset({'1', 'true', 'True', 'TRUE', 'yes', 'on'})
 
-@pedido_bp.route('', methods=['POST'])
-@require_api_key
-@swag_from({
+# --- Specs do Swagger (definidas uma vez no import e reutilizadas pelos decorators) ---
+
+_INCLUDE_ITEMS_PARAM = {'name': 'include_items', 'in': 'query', 'type': 'boolean', 'required': False, 'default': False}
+_INCLUDE_CLIENTE_PARAM = {'name': 'include_cliente_atual', 'in': 'query', 'type': 'boolean', 'required': False, 'default': False,
+                          'description': 'Inclui os dados atuais do cliente em "cliente_atual"'}
+
+CREATE_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Cria um novo pedido',
     'description': 'Cria um pedido para um cliente com uma lista de produtos e quantidades.',
@@ -123,53 +135,48 @@ ITEM_UPDATE_SCHEMA = {
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno do servidor.', 'schema': ERROR_SCHEMA}
     }
-})
-def create_pedido():
-    """ Rota POST /api/pedidos """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    pedido, error = create_pedido_service(data)
-
-    if error:
-        # Erros de validação ou de negócio são 400
-        if "Erro de validação" in error or "não encontrado" in error or "inválido" in error or "duplicado" in error:
-            return jsonify({"message": error}), 400
-        # Outros erros (DB) são 500
-        return jsonify({"message": error}), 500
+}
 
-    return jsonify(pedido), 201
+BATCH_SPEC = {
+    'tags': ['Pedidos'],
+    'summary': 'Cria pedidos em lote',
+    'description': 'Cria vários pedidos em uma única transação. Pedidos inválidos (cliente/produto não encontrado, item inválido ou duplicado) são retornados em "erros" com o índice no lote; os demais são criados. Retorna 201 se ao menos um pedido foi criado.',
+    'security': [{"ApiKeyAuth": []}],
+    'parameters': [{'name': 'body', 'in': 'body', 'required': True, 'schema': {'type': 'array', 'items': PEDIDO_INPUT_SCHEMA}}],
+    'responses': {
+        '201': {'description': 'Lote processado (ao menos um pedido criado).', 'schema': {
+            'type': 'object',
+            'properties': {
+                'criados': {'type': 'array', 'items': PEDIDO_OUTPUT_SCHEMA},
+                'erros': {'type': 'array', 'items': BATCH_ERROR_SCHEMA}
+            }
+        }},
+        '400': {'description': 'Corpo inválido, lote acima do limite ou nenhum pedido válido.', 'schema': ERROR_SCHEMA},
+        '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
+        '500': {'description': 'Erro interno do servidor.', 'schema': ERROR_SCHEMA}
+    }
+}
 
-@pedido_bp.route('', methods=['GET'])
-@require_api_key
-@swag_from({
+GET_ALL_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Lista ou filtra pedidos',
-    'description': 'Retorna uma lista de pedidos. Permite filtrar por cliente_id, data_inicio, data_fim.',
+    'description': 'Retorna uma lista de pedidos. Permite filtrar por cliente_id, data_inicio, data_fim. Itens e dados atuais do cliente podem ser incluídos (include_items, include_cliente_atual).',
     'security': [{"ApiKeyAuth": []}],
     'parameters': [
         {'name': 'cliente_id', 'in': 'query', 'type': 'integer', 'required': False},
         {'name': 'data_inicio', 'in': 'query', 'type': 'string', 'format': 'date', 'description': 'Formato YYYY-MM-DD', 'required': False},
-        {'name': 'data_fim', 'in': 'query', 'type': 'string', 'format': 'date', 'description': 'Formato YYYY-MM-DD', 'required': False}
+        {'name': 'data_fim', 'in': 'query', 'type': 'string', 'format': 'date', 'description': 'Formato YYYY-MM-DD', 'required': False},
+        _INCLUDE_ITEMS_PARAM,
+        _INCLUDE_CLIENTE_PARAM
     ],
     'responses': {
         '200': {'description': 'Lista de pedidos.', 'schema': {'type': 'array', 'items': PEDIDO_OUTPUT_SCHEMA}}, # Schema sem itens por padrão
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_all_pedidos():
-    """ Rota GET /api/pedidos """
-    filters = {k: v for k, v in request.args.items() if v}
-    pedidos, error = get_all_pedidos_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify(pedidos), 200
-
-@pedido_bp.route('/count', methods=['GET'])
-@require_api_key
-@swag_from({
+}
+
+COUNT_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Conta pedidos',
     'description': 'Retorna a quantidade total de pedidos, com filtros opcionais.',
@@ -180,50 +187,32 @@ def get_all_pedidos():
         {'name': 'data_fim', 'in': 'query', 'type': 'string', 'format': 'date', 'required': False}
     ],
     'responses': {
-        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_pedidos': {'type': 'integer'}}}},
+        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_pedidos': {'type': 'integer'}}}, 'headers': {'X-Total-Count': {'type': 'integer', 'description': 'Total (também enviado em HEAD, sem corpo)'}}},
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def count_pedidos():
-    """ Rota GET /api/pedidos/count """
-    filters = {k: v for k, v in request.args.items() if v}
-    count, error = count_pedidos_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify({"total_pedidos": count}), 200
+}
 
-@pedido_bp.route('/<int:pedido_id>', methods=['GET'])
-@require_api_key
-@swag_from({
+GET_BY_ID_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Busca pedido por ID',
-    'description': 'Retorna os detalhes de um pedido específico. Use ?include_items=true para ver os produtos.',
+    'description': 'Retorna os detalhes de um pedido específico. Use ?include_items=true para ver os produtos e ?include_cliente_atual=true para os dados atuais do cliente.',
     'security': [{"ApiKeyAuth": []}],
     'parameters': [
         {'name': 'pedido_id', 'in': 'path', 'type': 'integer', 'required': True},
-        {'name': 'include_items', 'in': 'query', 'type': 'boolean', 'required': False, 'default': False}
+        _INCLUDE_ITEMS_PARAM,
+        _INCLUDE_CLIENTE_PARAM
     ],
     'responses': {
-        '200': {'description': 'Pedido encontrado.', 'schema': PEDIDO_OUTPUT_SCHEMA},
+        '200': {'description': 'Pedido encontrado (com cabeçalho Last-Modified).', 'schema': PEDIDO_OUTPUT_SCHEMA},
+        '304': {'description': 'Não modificado desde o If-Modified-Since enviado.'},
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '404': {'description': 'Pedido não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_pedido(pedido_id):
-    """ Rota GET /api/pedidos/{id} """
-    include_items_param = request.args.get('include_items', 'false').lower() == 'true'
-    pedido, error = get_pedido_by_id_service(pedido_id, include_items=include_items_param)
-    if error:
-        return jsonify({"message": error}), 500
-    if not pedido:
-        return jsonify({"message": "Erro: Pedido não encontrado."}), 404
-    return jsonify(pedido), 200
-
-@pedido_bp.route('/<int:pedido_id>', methods=['PATCH'])
-@require_api_key
-@swag_from({
+}
+
+PATCH_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Atualiza parcialmente um pedido',
     'description': 'Atualiza campos como endereco_entrega, telefone_contato, email_pedido.',
@@ -239,28 +228,9 @@ def get_pedido(pedido_id):
         '404': {'description': 'Pedido não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def patch_pedido(pedido_id):
-    """ Rota PATCH /api/pedidos/{id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    pedido, error = patch_pedido_service(pedido_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Nenhum dado" in error or "Nenhum campo válido" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not pedido:
-        return jsonify({"message": "Erro: Pedido não encontrado."}), 404
-    return jsonify(pedido), 200
+}
 
-@pedido_bp.route('/<int:pedido_id>', methods=['DELETE'])
-@require_api_key
-@swag_from({
+DELETE_SPEC = {
     'tags': ['Pedidos'],
     'summary': 'Deleta um pedido',
     'description': 'Deleta um pedido e todos os seus itens associados.',
@@ -272,23 +242,9 @@ def patch_pedido(pedido_id):
         '404': {'description': 'Pedido não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def delete_pedido(pedido_id):
-    """ Rota DELETE /api/pedidos/{id} """
-    result, error = delete_pedido_service(pedido_id)
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        return jsonify({"message": error}), 500
-    if not result:
-        return jsonify({"message": "Erro: Pedido não encontrado."}), 404
-    return jsonify(result), 200
-
-# --- Endpoints para Gerenciar Itens de um Pedido ---
+}
 
-@pedido_bp.route('/<int:pedido_id>/items', methods=['POST'])
-@require_api_key
-@swag_from({
+ADD_ITEM_SPEC = {
     'tags': ['Pedidos Itens'],
     'summary': 'Adiciona um item a um pedido existente',
     'description': 'Adiciona um produto com quantidade a um pedido. Se o produto já existir, pode somar a quantidade (verificar lógica no serviço).',
@@ -304,27 +260,37 @@ def delete_pedido(pedido_id):
         '404': {'description': 'Pedido ou Produto não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def add_item_to_pedido(pedido_id):
-    """ Rota POST /api/pedidos/{id}/items """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    pedido_atualizado, error = add_item_to_pedido_service(pedido_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Erro de validação" in error or "inválido" in error or "já existe" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    return jsonify(pedido_atualizado), 200
-
-
-@pedido_bp.route('/<int:pedido_id>/items/<int:produto_id>', methods=['PUT'])
-@require_api_key
-@swag_from({
+}
+
+ADD_ITEMS_BULK_SPEC = {
+    'tags': ['Pedidos Itens'],
+    'summary': 'Adiciona vários itens a um pedido existente',
+    'description': 'Adiciona os itens em uma única transação. Produtos já presentes no pedido têm a quantidade somada. Itens inválidos (produto não encontrado, quantidade inválida ou produto repetido no lote) são retornados em "erros" com o índice na lista; os demais são gravados. Retorna 200 se ao menos um item foi adicionado.',
+    'security': [{"ApiKeyAuth": []}],
+    'parameters': [
+        {'name': 'pedido_id', 'in': 'path', 'type': 'integer', 'required': True},
+        {'name': 'body', 'in': 'body', 'required': True, 'schema': {
+            'type': 'object',
+            'required': ['items'],
+            'properties': {'items': {'type': 'array', 'items': PEDIDO_ITEM_INPUT_SCHEMA}}
+        }}
+    ],
+    'responses': {
+        '200': {'description': 'Itens processados, retorna o pedido completo com itens.', 'schema': {
+            'type': 'object',
+            'properties': {
+                'pedido': PEDIDO_OUTPUT_SCHEMA,
+                'erros': {'type': 'array', 'items': BATCH_ERROR_SCHEMA}
+            }
+        }},
+        '400': {'description': 'Corpo inválido, lote acima do limite ou nenhum item válido.', 'schema': ERROR_SCHEMA},
+        '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
+        '404': {'description': 'Pedido não encontrado.', 'schema': ERROR_SCHEMA},
+        '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
+    }
+}
+
+UPDATE_ITEM_SPEC = {
     'tags': ['Pedidos Itens'],
     'summary': 'Atualiza a quantidade de um item em um pedido',
     'description': 'Modifica a quantidade de um produto específico dentro de um pedido.',
@@ -341,27 +307,9 @@ def add_item_to_pedido(pedido_id):
         '404': {'description': 'Pedido ou Item não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def update_item_in_pedido(pedido_id, produto_id):
-    """ Rota PUT /api/pedidos/{id}/items/{produto_id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    pedido_atualizado, error = update_item_in_pedido_service(pedido_id, produto_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Erro de validação" in error or "inválida" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    return jsonify(pedido_atualizado), 200
-
+}
 
-@pedido_bp.route('/<int:pedido_id>/items/<int:produto_id>', methods=['DELETE'])
-@require_api_key
-@swag_from({
+REMOVE_ITEM_SPEC = {
     'tags': ['Pedidos Itens'],
     'summary': 'Remove um item de um pedido',
     'description': 'Exclui um produto específico de um pedido.',
@@ -376,14 +324,103 @@ def update_item_in_pedido(pedido_id, produto_id):
         '404': {'description': 'Pedido ou Item não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
+}
+
+_BAD_ITEMS = (orjson.dumps({"message": "Erro: O corpo da requisição deve conter 'items' com uma lista JSON não vazia."}), 400)
+
+# --- Endpoints da API ---
+# Rotas que só leem o corpo JSON e chamam o serviço são montadas por body_view (ver _http.py)
+
+# Rota POST /api/pedidos
+create_pedido = body_view('create_pedido', create_pedido_service, CREATE_SPEC, 201, validate=_validate_pedido_in)
+pedido_bp.add_url_rule('', view_func=create_pedido, methods=['POST'])
+
+@pedido_bp.route('/batch', methods=['POST'])
+@swag_spec(BATCH_SPEC)
+def create_pedidos_batch():
+    """ Rota POST /api/pedidos/batch """
+    data = json_body()
+    if not data or not isinstance(data, list):
+        return prebuilt_response(BAD_BATCH)
+
+    result = create_pedidos_batch_service(data)
+    # 201 se algo foi criado; se todos os itens falharam, 400 com a lista de erros
+    return json_response(result, 201 if result["criados"] else 400)
+
+@pedido_bp.route('', methods=['GET'])
+@swag_spec(GET_ALL_SPEC)
+def get_all_pedidos():
+    """ Rota GET /api/pedidos """
+    args = request.args
+    filters = {k: v for k in _PEDIDO_FILTERS if (v := args.get(k))}
+    pedidos = get_all_pedidos_service(
+        filters,
+        include_items=args.get('include_items', '') in _TRUE,
+        include_cliente_atual=args.get('include_cliente_atual', '') in _TRUE
+    )
+    # Streaming: cada pedido é serializado e enviado sem montar a lista inteira em memória
+    return Response(stream_with_context(stream_json_array(pedidos)), mimetype='application/json')
+
+@pedido_bp.route('/count', methods=['GET', 'HEAD'])
+@swag_spec(COUNT_SPEC)
+def count_pedidos():
+    """ Rota GET|HEAD /api/pedidos/count """
+    args = request.args
+    # Ordem fixa das chaves: o dict de filtros faz parte da chave do cache
+    filters = {k: v for k in _PEDIDO_FILTERS if (v := args.get(k))}
+    return count_response("total_pedidos", count_pedidos_service(filters))
+
+@pedido_bp.route('/<int:pedido_id>', methods=['GET'])
+@swag_spec(GET_BY_ID_SPEC)
+def get_pedido(pedido_id):
+    """ Rota GET /api/pedidos/{id} """
+    args = request.args
+    pedido = get_pedido_by_id_service(
+        pedido_id,
+        include_items=args.get('include_items', '') in _TRUE,
+        include_cliente_atual=args.get('include_cliente_atual', '') in _TRUE
+    )
+    return last_modified_response(pedido)
+
+# Rota PATCH /api/pedidos/{id}
+patch_pedido = body_view('patch_pedido', patch_pedido_service, PATCH_SPEC, validate=_validate_pedido_patch)
+pedido_bp.add_url_rule('/<int:pedido_id>', view_func=patch_pedido, methods=['PATCH'])
+
+@pedido_bp.route('/<int:pedido_id>', methods=['DELETE'])
+@swag_spec(DELETE_SPEC)
+def delete_pedido(pedido_id):
+    """ Rota DELETE /api/pedidos/{id} """
+    return json_response(delete_pedido_service(pedido_id))
+
+# --- Endpoints para Gerenciar Itens de um Pedido ---
+
+# Rota POST /api/pedidos/{id}/items
+add_item_to_pedido = body_view('add_item_to_pedido', add_item_to_pedido_service, ADD_ITEM_SPEC, validate=_validate_item_in)
+pedido_bp.add_url_rule('/<int:pedido_id>/items', view_func=add_item_to_pedido, methods=['POST'])
+
+
+@pedido_bp.route('/<int:pedido_id>/items:bulk', methods=['POST'])
+@swag_spec(ADD_ITEMS_BULK_SPEC)
+def add_items_to_pedido(pedido_id):
+    """ Rota POST /api/pedidos/{id}/items:bulk """
+    data = json_body()
+    itens = data.get('items') if isinstance(data, dict) else None
+    if not itens or not isinstance(itens, list):
+        return prebuilt_response(_BAD_ITEMS)
+
+    result = add_items_to_pedido_service(pedido_id, itens)
+    # 400 com a lista de erros se nenhum item foi adicionado
+    return json_response(result, 200 if result["pedido"] else 400)
+
+
+# Rota PUT /api/pedidos/{id}/items/{produto_id}
+update_item_in_pedido = body_view('update_item_in_pedido', update_item_in_pedido_service, UPDATE_ITEM_SPEC, validate=_validate_item_update)
+pedido_bp.add_url_rule('/<int:pedido_id>/items/<int:produto_id>', view_func=update_item_in_pedido, methods=['PUT'])
+
+
+@pedido_bp.route('/<int:pedido_id>/items/<int:produto_id>', methods=['DELETE'])
+@swag_spec(REMOVE_ITEM_SPEC)
 def remove_item_from_pedido(pedido_id, produto_id):
     """ Rota DELETE /api/pedidos/{id}/items/{produto_id} """
-    pedido_atualizado, error = remove_item_from_pedido_service(pedido_id, produto_id)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        return jsonify({"message": error}), 500
-    return jsonify(pedido_atualizado), 200
+    return json_response(remove_item_from_pedido_service(pedido_id, produto_id))
 
@@ -1,9 +1,16 @@
 # ./app/controllers/produto_controller.py
 # Define os endpoints da API REST para a entidade Produto.
 
-from flask import Blueprint, request, jsonify
-from flasgger import swag_from
-from app import require_api_key # Importa o decorator de autenticação
+import threading
+import time
+import orjson
+from flask import Blueprint, request, current_app
+from app import check_api_key # Hook de autenticação por chave de API
+from app.controllers._schemas import ERROR_SCHEMA, BATCH_ERROR_SCHEMA
+from app.controllers._http import (
+    json_body, BAD_BATCH, prebuilt_response, json_response, conditional_json_response,
+    body_etag, conditional_body_response, swag_spec, body_view, count_response, body_validator, last_modified_response
+)
 from app.services.produto_service import ( # Importa os serviços de produto
     get_all_produtos_service,
     count_produtos_service,
@@ -11,11 +18,14 @@ from app.services.produto_service import ( # Importa os serviços de produto
     create_produto_service,
     update_produto_service,
     patch_produto_service,
-    delete_produto_service
+    delete_produto_service,
+    create_produtos_batch_service
 )
 
 # Cria o Blueprint para produtos
 produto_bp = Blueprint('produto_bp', __name__)
+# Todas as rotas do blueprint exigem a chave de API
+produto_bp.before_request(check_api_key)
 
 # --- Definições de Schema para Swagger ---
 
@@ -26,7 +36,8 @@ PRODUTO_SCHEMA = {
         "nome": {"type": "string", "description": "Nome do produto", "example": "Laptop XPTO"},
         # CORREÇÃO: Tipo number, formato float/double para valor
         "valor": {"type": "number", "format": "float", "description": "Preço do produto", "example": 4500.99},
-        "ean": {"type": "string", "description": "Código EAN (código de barras)", "nullable": True, "example": "7891234567890"}
+        "ean": {"type": "string", "description": "Código EAN (código de barras)", "nullable": True, "example": "7891234567890"},
+        "data_atualizacao": {"type": "string", "format": "date-time", "description": "Data da última alteração (UTC)"}
     }
 }
 
@@ -37,7 +48,7 @@ PRODUTO_INPUT_SCHEMA = {
         "nome": {"type": "string", "description": "Nome do produto", "example": "Teclado Gamer"},
         # Input ainda pode ser string, a validação/conversão ocorre no serviço
         "valor": {"type": "string", "description": "Preço do produto (enviar como string, ex: \"199.90\")", "example": "199.90"},
-        "ean": {"type": "string", "description": "Código EAN (opcional, único)", "example": "7890000111222"}
+        "ean": {"type": "string", "description": "Código EAN (opcional, único)", "nullable": True, "example": "7890000111222"}
     }
 }
 
@@ -63,75 +74,81 @@ PRODUTO_PATCH_SCHEMA = {
     "minProperties": 1
 }
 
-ERROR_SCHEMA = { # Reutilizado do cliente_controller
-    "type": "object",
-    "properties": {
-        "message": {"type": "string", "description": "Mensagem de erro"}
-    }
-}
+# Validadores do corpo gerados a partir dos schemas acima (compilados uma vez, no import).
+# O valor é documentado como string, mas o serviço também aceita número.
+_validate_produto_in = body_validator(PRODUTO_INPUT_SCHEMA, valor=['string', 'number'])
+_validate_produto_put = body_validator(PRODUTO_PUT_SCHEMA, valor=['string', 'number'])
+_validate_produto_patch = body_validator(PRODUTO_PATCH_SCHEMA, valor=['string', 'number'])
 
+# Filtros aceitos pelas rotas de listagem/contagem (parâmetros desconhecidos são ignorados)
+_PRODUTO_FILTERS = ('nome', 'ean', 'valor_min', 'valor_max')
 
-# --- Endpoints da API ---
+# Listagem sem filtros (o caso mais comum): corpo JSON e ETag ficam prontos em memória e são
+# refeitos após uma escrita bem-sucedida neste blueprint ou quando o timeout do cache expira.
+_all_produtos = [None] # [(expira_em, etag, corpo)]: a tupla é trocada inteira, nunca alterada
+_all_produtos_lock = threading.Lock()
 
-@produto_bp.route('', methods=['GET'])
-@require_api_key
-@swag_from({
+def _all_produtos_response():
+    """Resposta de GET /api/produtos sem query string, servida do corpo pré-serializado."""
+    entry = _all_produtos[0]
+    if entry is None or entry[0] < time.monotonic():
+        with _all_produtos_lock:
+            # Outra thread pode ter renovado enquanto esperávamos o lock
+            entry = _all_produtos[0]
+            if entry is None or entry[0] < time.monotonic():
+                body = orjson.dumps(get_all_produtos_service({}))
+                expira_em = time.monotonic() + current_app.config['CACHE_DEFAULT_TIMEOUT']
+                entry = _all_produtos[0] = (expira_em, body_etag(body), body)
+    return conditional_body_response(entry[2], entry[1])
+
+@produto_bp.after_request
+def _descartar_listagem_pronta(response):
+    """Qualquer escrita bem-sucedida em produtos descarta a listagem pré-serializada."""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400:
+        # Com o lock: espera uma renovação em andamento (que pode ter lido dados antigos) terminar
+        with _all_produtos_lock:
+            _all_produtos[0] = None
+    return response
+
+# --- Specs do Swagger (definidas uma vez no import e reutilizadas pelos decorators) ---
+
+# Parâmetros de filtro compartilhados pela listagem e pela contagem
+_FILTER_PARAMS = [
+    {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False},
+    {'name': 'ean', 'in': 'query', 'type': 'string', 'required': False},
+    # Mantém number para filtros de valor no Swagger
+    {'name': 'valor_min', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False},
+    {'name': 'valor_max', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False}
+]
+
+GET_ALL_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Lista ou filtra produtos',
     'description': 'Retorna lista de produtos. Filtra por nome (parcial), ean (exato), valor_min, valor_max.',
     'security': [{"ApiKeyAuth": []}],
-    'parameters': [
-        {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'ean', 'in': 'query', 'type': 'string', 'required': False},
-        # Mantém number para filtros de valor no Swagger
-        {'name': 'valor_min', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False},
-        {'name': 'valor_max', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False}
-    ],
+    'parameters': _FILTER_PARAMS,
     'responses': {
         # CORREÇÃO: Schema de resposta usa o PRODUTO_SCHEMA atualizado
         '200': {'description': 'Lista de produtos.', 'schema': {'type': 'array', 'items': PRODUTO_SCHEMA}},
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_all_produtos():
-    """ Rota GET /api/produtos """
-    filters = {k: v for k, v in request.args.items() if v is not None} # Pega args com valor
-    produtos, error = get_all_produtos_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify(produtos), 200 # O jsonify do Flask lida bem com floats
-
-@produto_bp.route('/count', methods=['GET'])
-@require_api_key
-@swag_from({
+}
+
+COUNT_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Conta produtos',
     'description': 'Retorna quantidade total de produtos, com filtros opcionais.',
     'security': [{"ApiKeyAuth": []}],
-    'parameters': [
-        {'name': 'nome', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'ean', 'in': 'query', 'type': 'string', 'required': False},
-        {'name': 'valor_min', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False},
-        {'name': 'valor_max', 'in': 'query', 'type': 'number', 'format': 'float', 'required': False}
-    ],
+    'parameters': _FILTER_PARAMS,
     'responses': {
-        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_produtos': {'type': 'integer'}}}},
+        '200': {'description': 'Contagem retornada.', 'schema': {'type': 'object', 'properties': {'total_produtos': {'type': 'integer'}}}, 'headers': {'X-Total-Count': {'type': 'integer', 'description': 'Total (também enviado em HEAD, sem corpo)'}}},
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def count_produtos():
-    """ Rota GET /api/produtos/count """
-    filters = {k: v for k, v in request.args.items() if v is not None}
-    count, error = count_produtos_service(filters)
-    if error:
-        return jsonify({"message": error}), 500
-    return jsonify({"total_produtos": count}), 200
+}
 
-@produto_bp.route('/<int:produto_id>', methods=['GET'])
-@require_api_key
-@swag_from({
+GET_BY_ID_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Busca produto por ID',
     'description': 'Retorna os detalhes de um produto específico.',
@@ -139,24 +156,15 @@ def count_produtos():
     'parameters': [{'name': 'produto_id', 'in': 'path', 'type': 'integer', 'required': True}],
     'responses': {
         # CORREÇÃO: Schema de resposta usa o PRODUTO_SCHEMA atualizado
-        '200': {'description': 'Produto encontrado.', 'schema': PRODUTO_SCHEMA},
+        '200': {'description': 'Produto encontrado (com cabeçalho Last-Modified).', 'schema': PRODUTO_SCHEMA},
+        '304': {'description': 'Não modificado desde o If-Modified-Since enviado.'},
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '404': {'description': 'Produto não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def get_produto(produto_id):
-    """ Rota GET /api/produtos/{id} """
-    produto, error = get_produto_by_id_service(produto_id)
-    if error:
-        return jsonify({"message": error}), 500
-    if not produto:
-        return jsonify({"message": "Erro: Produto não encontrado."}), 404
-    return jsonify(produto), 200
-
-@produto_bp.route('', methods=['POST'])
-@require_api_key
-@swag_from({
+}
+
+CREATE_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Cria novo produto',
     'description': 'Adiciona um novo produto ao banco de dados.',
@@ -169,24 +177,29 @@ def get_produto(produto_id):
         '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def create_produto():
-    """ Rota POST /api/produtos """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    produto, error = create_produto_service(data)
-
-    if error:
-        if "obrigatórios" in error or "EAN" in error or "Valor inválido" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    return jsonify(produto), 201
-
-@produto_bp.route('/<int:produto_id>', methods=['PUT'])
-@require_api_key
-@swag_from({
+}
+
+BATCH_SPEC = {
+    'tags': ['Produtos'],
+    'summary': 'Cria produtos em lote',
+    'description': 'Cria vários produtos em uma única transação. Itens inválidos (ou com EAN duplicado) são retornados em "erros" com o índice no lote; os demais são criados. Retorna 201 se ao menos um produto foi criado.',
+    'security': [{"ApiKeyAuth": []}],
+    'parameters': [{'name': 'body', 'in': 'body', 'required': True, 'schema': {'type': 'array', 'items': PRODUTO_INPUT_SCHEMA}}],
+    'responses': {
+        '201': {'description': 'Lote processado (ao menos um produto criado).', 'schema': {
+            'type': 'object',
+            'properties': {
+                'criados': {'type': 'array', 'items': PRODUTO_SCHEMA},
+                'erros': {'type': 'array', 'items': BATCH_ERROR_SCHEMA}
+            }
+        }},
+        '400': {'description': 'Corpo inválido, lote acima do limite ou nenhum produto válido.', 'schema': ERROR_SCHEMA},
+        '401': {'description': 'Erro: Chave de API inválida ou ausente.', 'schema': ERROR_SCHEMA},
+        '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
+    }
+}
+
+PUT_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Atualiza produto (substituição completa)',
     'description': 'Atualiza todos os dados de um produto existente.',
@@ -203,28 +216,9 @@ def create_produto():
         '404': {'description': 'Produto não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def update_produto(produto_id):
-    """ Rota PUT /api/produtos/{id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    produto, error = update_produto_service(produto_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "devem ser enviados" in error or "EAN" in error or "Valor inválido" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not produto:
-        return jsonify({"message": "Erro: Produto não encontrado."}), 404
-    return jsonify(produto), 200
-
-@produto_bp.route('/<int:produto_id>', methods=['PATCH'])
-@require_api_key
-@swag_from({
+}
+
+PATCH_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Atualiza parcialmente produto',
     'description': 'Atualiza um ou mais campos de um produto existente.',
@@ -241,28 +235,9 @@ def update_produto(produto_id):
         '404': {'description': 'Produto não encontrado.', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
-def patch_produto(produto_id):
-    """ Rota PATCH /api/produtos/{id} """
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Erro: Corpo da requisição JSON inválido ou vazio."}), 400
-
-    produto, error = patch_produto_service(produto_id, data)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Nenhum dado" in error or "Nenhum campo válido" in error or "EAN" in error or "Valor inválido" in error or "unicidade" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not produto:
-        return jsonify({"message": "Erro: Produto não encontrado."}), 404
-    return jsonify(produto), 200
+}
 
-@produto_bp.route('/<int:produto_id>', methods=['DELETE'])
-@require_api_key
-@swag_from({
+DELETE_SPEC = {
     'tags': ['Produtos'],
     'summary': 'Deleta produto por ID',
     'description': 'Remove um produto do banco de dados.',
@@ -275,17 +250,63 @@ def patch_produto(produto_id):
         '400': {'description': 'Erro ao deletar (dependências).', 'schema': ERROR_SCHEMA},
         '500': {'description': 'Erro interno.', 'schema': ERROR_SCHEMA}
     }
-})
+}
+
+# --- Endpoints da API ---
+# Rotas que só leem o corpo JSON e chamam o serviço são montadas por body_view (ver _http.py)
+
+@produto_bp.route('', methods=['GET'])
+@swag_spec(GET_ALL_SPEC)
+def get_all_produtos():
+    """ Rota GET /api/produtos """
+    if not request.query_string:
+        return _all_produtos_response()
+    args = request.args
+    # Ordem fixa das chaves: o dict de filtros faz parte da chave do cache
+    filters = {k: v for k in _PRODUTO_FILTERS if (v := args.get(k)) is not None}
+    produtos = get_all_produtos_service(filters)
+    return conditional_json_response(produtos) # ETag: 304 se o cliente já tem esta versão
+
+@produto_bp.route('/count', methods=['GET', 'HEAD'])
+@swag_spec(COUNT_SPEC)
+def count_produtos():
+    """ Rota GET|HEAD /api/produtos/count """
+    args = request.args
+    filters = {k: v for k in _PRODUTO_FILTERS if (v := args.get(k)) is not None}
+    return count_response("total_produtos", count_produtos_service(filters))
+
+@produto_bp.route('/<int:produto_id>', methods=['GET'])
+@swag_spec(GET_BY_ID_SPEC)
+def get_produto(produto_id):
+    """ Rota GET /api/produtos/{id} """
+    return last_modified_response(get_produto_by_id_service(produto_id))
+
+# Rota POST /api/produtos
+create_produto = body_view('create_produto', create_produto_service, CREATE_SPEC, 201, validate=_validate_produto_in)
+produto_bp.add_url_rule('', view_func=create_produto, methods=['POST'])
+
+@produto_bp.route('/batch', methods=['POST'])
+@swag_spec(BATCH_SPEC)
+def create_produtos_batch():
+    """ Rota POST /api/produtos/batch """
+    data = json_body()
+    if not data or not isinstance(data, list):
+        return prebuilt_response(BAD_BATCH)
+
+    result = create_produtos_batch_service(data)
+    # 201 se algo foi criado; se todos os itens falharam, 400 com a lista de erros
+    return json_response(result, 201 if result["criados"] else 400)
+
+# Rota PUT /api/produtos/{id}
+update_produto = body_view('update_produto', update_produto_service, PUT_SPEC, validate=_validate_produto_put)
+produto_bp.add_url_rule('/<int:produto_id>', view_func=update_produto, methods=['PUT'])
+
+# Rota PATCH /api/produtos/{id}
+patch_produto = body_view('patch_produto', patch_produto_service, PATCH_SPEC, validate=_validate_produto_patch)
+produto_bp.add_url_rule('/<int:produto_id>', view_func=patch_produto, methods=['PATCH'])
+
+@produto_bp.route('/<int:produto_id>', methods=['DELETE'])
+@swag_spec(DELETE_SPEC)
 def delete_produto(produto_id):
     """ Rota DELETE /api/produtos/{id} """
-    result, error = delete_produto_service(produto_id)
-
-    if error:
-        if "não encontrado" in error:
-            return jsonify({"message": error}), 404
-        if "Não é possível excluir" in error or "registros dependentes" in error:
-            return jsonify({"message": error}), 400
-        return jsonify({"message": error}), 500
-    if not result:
-        return jsonify({"message": "Erro: Produto não encontrado."}), 404
-    return jsonify(result), 200
+    return json_response(delete_produto_service(produto_id))
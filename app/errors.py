@@ -0,0 +1,43 @@
+# ./app/errors.py
+# Códigos de erro retornados pelos serviços. O valor de cada código é o status HTTP correspondente.
+
+from enum import IntEnum
+
+class ErrorCode(IntEnum):
+    """Categoria de erro de um serviço, usada pelo controller como status HTTP da resposta."""
+    DUP_OR_INVALID = 400 # Dados inválidos/faltando, duplicidade (CPF/Email) ou dependências
+    NOT_FOUND = 404
+    INTERNAL = 500 # Erros de banco de dados
+
+
+class APIError(Exception):
+    """Erro levantado pelos serviços; o handler registrado em create_app o converte em resposta JSON."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# Códigos de violação de unicidade dos drivers (MySQL: ER_DUP_ENTRY; PostgreSQL: unique_violation)
+_MYSQL_DUP_ENTRY = 1062
+_PG_UNIQUE_VIOLATION = '23505'
+
+def unique_violation_key(exc):
+    """
+    Nome da chave única violada em um IntegrityError do SQLAlchemy (ex: 'cpf'), ou None se o erro
+    não for de unicidade. Decide pelo código de erro do driver, não por trechos da mensagem.
+    """
+    orig = getattr(exc, 'orig', None)
+    args = getattr(orig, 'args', ())
+    if len(args) > 1 and args[0] == _MYSQL_DUP_ENTRY:
+        # "Duplicate entry 'x' for key 'cliente.cpf'" (antes do MySQL 8: "for key 'cpf'")
+        key = str(args[1]).rpartition(" for key ")[2].strip("'")
+    elif getattr(orig, 'pgcode', None) == _PG_UNIQUE_VIOLATION:
+        key = orig.diag.constraint_name
+    elif getattr(orig, 'sqlite_errorname', None) == 'SQLITE_CONSTRAINT_UNIQUE':
+        # "UNIQUE constraint failed: cliente.cpf"
+        key = str(orig).rpartition(" ")[2]
+    else:
+        return None
+    return key.rpartition('.')[2]
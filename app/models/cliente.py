@@ -8,6 +8,8 @@ class Cliente(db.Model):
     """
     Modelo SQLAlchemy para a tabela Cliente.
     Utiliza nomes de coluna em minúsculo.
+    A coleção 'pedidos' nunca é carregada sob demanda (lazy="raise_on_sql"): quem precisar dela
+    deve pedi-la na consulta, ex: select(...).options(selectinload(Cliente.pedidos)).
     """
     __tablename__ = 'cliente'
 
@@ -15,7 +17,7 @@ class Cliente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(255), nullable=False)
     cpf = db.Column(db.String(14), unique=True, nullable=False)
-    telefone = db.Column(db.String(20), nullable=True)
+    telefone = db.Column(db.String(20), nullable=True, index=True) # Indexado para o filtro exato por telefone
     endereco = db.Column(db.String(500), nullable=True)
     email = db.Column(db.String(120), unique=True, nullable=True)
 
@@ -23,8 +25,11 @@ class Cliente(db.Model):
     # Define explicitamente o relacionamento Um-para-Muitos com Pedido
     # Um cliente pode ter muitos pedidos.
     # 'back_populates' conecta este lado com o atributo 'cliente' no modelo Pedido.
-    # 'lazy=True' é o padrão, carrega os pedidos apenas quando acessados.
-    pedidos = relationship("Pedido", back_populates="cliente", lazy=True)
+    # lazy="raise_on_sql": acessar a coleção sem carregá-la na consulta (selectinload) levanta erro,
+    # em vez de disparar um SELECT escondido por cliente (N+1).
+    # passive_deletes: ao excluir um cliente o ORM não carrega os pedidos; a chave estrangeira
+    # do banco recusa a exclusão se houver pedidos.
+    pedidos = relationship("Pedido", back_populates="cliente", lazy="raise_on_sql", passive_deletes=True)
 
     # --- Métodos Úteis ---
     def __repr__(self):
@@ -6,6 +6,9 @@ from app import db
 from sqlalchemy.orm import relationship
 from decimal import Decimal
 
+# Zero monetário reutilizado (evita criar um Decimal a partir de string a cada uso)
+_ZERO = Decimal('0.00')
+
 # Import Cliente para type hinting (opcional)
 # from .cliente import Cliente # Não estritamente necessário aqui
 
@@ -15,9 +18,17 @@ class Pedido(db.Model):
     Inclui campos para armazenar um snapshot dos dados do cliente.
     """
     __tablename__ = 'pedido'
+    # Listagem/contagem filtradas por cliente, ordenadas (ou filtradas) por data_criacao:
+    # o índice composto resolve o filtro e a ordenação sem filesort
+    __table_args__ = (
+        db.Index('ix_pedido_cliente_data', 'cliente_id', 'data_criacao'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     data_criacao = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    # Data da última alteração (dados do pedido, itens ou totais); usada no Last-Modified do GET por ID
+    data_atualizacao = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow,
+                                 server_default=db.func.now(), nullable=False, index=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
     nome_cliente = db.Column(db.String(255), nullable=False)
     cpf_cliente = db.Column(db.String(14), nullable=False)
@@ -25,7 +36,7 @@ class Pedido(db.Model):
     telefone_contato = db.Column(db.String(20), nullable=True)
     email_pedido = db.Column(db.String(120), nullable=True)
     qtd_total = db.Column(db.Integer, default=0, nullable=False)
-    valor_total = db.Column(db.Numeric(12, 2), default=Decimal('0.00'), nullable=False)
+    valor_total = db.Column(db.Numeric(12, 2), default=_ZERO, nullable=False)
 
     # --- Relacionamentos ---
     # Relacionamento com Cliente: Usa back_populates para ligar com 'pedidos' em Cliente
@@ -33,30 +44,38 @@ class Pedido(db.Model):
     cliente = relationship("Cliente", back_populates="pedidos")
 
     # Relacionamento com PedidoProduto (mantido)
+    # passive_deletes: ao excluir o pedido, o ORM não carrega os itens; o ON DELETE CASCADE da
+    # chave estrangeira os remove no banco
     produtos_associados = relationship(
         "PedidoProduto",
         back_populates="pedido",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     def __repr__(self):
         return f"<Pedido {self.id} - Cliente: {self.nome_cliente} - Valor {self.valor_total}>"
 
-    def calcular_e_atualizar_totais(self):
-        """Calcula qtd_total e valor_total com base nos itens associados."""
-        nova_qtd_total = 0
-        novo_valor_total = Decimal('0.00')
-        for item in self.produtos_associados:
-            nova_qtd_total += item.quantidade
-            novo_valor_total += item.quantidade * item.valor_unitario
-        self.qtd_total = nova_qtd_total
-        self.valor_total = novo_valor_total
+    def apply_item_delta(self, qtd_delta, valor_delta):
+        """
+        Aplica aos totais a variação causada pela alteração de um item (O(1), sem somar os itens).
+        Os totais viram expressões SQL (qtd_total = qtd_total + delta) gravadas no próximo flush,
+        então alterações concorrentes no mesmo pedido não se sobrescrevem; após o flush os valores
+        são relidos do banco no próximo acesso.
+        """
+        self.qtd_total = Pedido.qtd_total + qtd_delta
+        self.valor_total = Pedido.valor_total + valor_delta
 
     def to_dict(self, include_items=False, include_cliente_atual=False): # Adiciona flag
-        """Converte o objeto Pedido para um dicionário serializável."""
+        """
+        Converte o objeto Pedido para um dicionário serializável.
+        Com include_items/include_cliente_atual, carregue os relacionamentos antecipadamente na
+        consulta (selectinload/joinedload, ver pedido_service) para evitar um lazy load por pedido.
+        """
         data = {
             'id': self.id,
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None,
             'cliente_id': self.cliente_id,
             # Dados do snapshot
             'nome_cliente': self.nome_cliente,
@@ -14,7 +14,8 @@ class PedidoProduto(db.Model):
     __tablename__ = 'pedido_produto' # Nome da tabela
 
     # Chaves primárias compostas / estrangeiras
-    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), primary_key=True)
+    # ON DELETE CASCADE: excluir o pedido apaga os itens no próprio banco, em um único DELETE
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id', ondelete='CASCADE'), primary_key=True)
     produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), primary_key=True)
 
     # --- Campos de Snapshot do Produto (sem _momento) ---
@@ -2,6 +2,7 @@
 # Define o modelo SQLAlchemy para a tabela Produto.
 # ATUALIZADO: Adicionado relacionamento explícito com PedidoProduto usando back_populates.
 
+import datetime
 from app import db
 from decimal import Decimal
 from sqlalchemy.orm import relationship # Importa relationship
@@ -10,24 +11,31 @@ class Produto(db.Model):
     """
     Modelo SQLAlchemy para a tabela Produto.
     Utiliza nomes de coluna em minúsculo.
+    A coleção 'pedidos_associados' nunca é carregada sob demanda (lazy="raise_on_sql"): quem precisar dela
+    deve pedi-la na consulta, ex: select(...).options(selectinload(Produto.pedidos_associados)).
     """
     __tablename__ = 'produto'
 
     # --- Colunas da Tabela ---
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(255), nullable=False)
-    valor = db.Column(db.Numeric(10, 2), nullable=False)
+    valor = db.Column(db.Numeric(10, 2), nullable=False, index=True) # Indexado para os filtros de faixa de valor
     ean = db.Column(db.String(13), unique=True, nullable=True)
+    # Data da última alteração (Last-Modified do GET por ID); indexada para filtros por data
+    data_atualizacao = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow,
+                                 server_default=db.func.now(), nullable=False, index=True)
 
     # --- Relacionamentos ---
     # Define explicitamente o relacionamento Um-para-Muitos com PedidoProduto
     # Um produto pode estar associado a muitos itens de pedido.
     # 'back_populates' conecta este lado com o atributo 'produto' no modelo PedidoProduto.
-    # 'lazy=True' é o padrão, carrega os pedidos apenas quando acessados.
+    # lazy="raise_on_sql": a coleção só pode ser usada se carregada na consulta (selectinload);
+    # acesso acidental levanta erro em vez de um SELECT por produto (N+1).
     pedidos_associados = relationship(
         "PedidoProduto", # Aponta para a classe de associação
         back_populates="produto", # Linka com o atributo 'produto' em PedidoProduto
-        lazy=True
+        lazy="raise_on_sql",
+        passive_deletes=True # Exclusão não carrega os itens; a chave estrangeira decide
     )
 
     # --- Métodos Úteis ---
@@ -39,6 +47,7 @@ class Produto(db.Model):
             'id': self.id,
             'nome': self.nome,
             'valor': float(self.valor) if self.valor is not None else None,
-            'ean': self.ean
+            'ean': self.ean,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
         }
 
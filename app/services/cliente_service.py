@@ -1,74 +1,117 @@
 # ./app/services/cliente_service.py
 # Contém a lógica de negócio para Cliente, usando SQLAlchemy, nomes minúsculos e incluindo o campo email.
+# Os serviços retornam o resultado diretamente e levantam APIError (com um ErrorCode) em caso de erro.
 
+import logging
+from sqlalchemy import func, insert, lambda_stmt, or_, select, update
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from app import db
+from app import db, BATCH_MAX
+from app.errors import APIError, ErrorCode, unique_violation_key
 from app.models.cliente import Cliente
 
-def _build_sqlalchemy_filters(query, filters):
-    """Aplica filtros SQLAlchemy a uma query existente, usando nomes em minúsculo."""
-    # Adiciona 'email' aos filtros permitidos
-    allowed_filters = ['nome', 'cpf', 'telefone', 'endereco', 'email']
+log = logging.getLogger(__name__)
 
+# Colunas da listagem, na ordem/nomes do Cliente.to_dict()
+_LIST_COLUMNS = (Cliente.id, Cliente.nome, Cliente.cpf, Cliente.telefone, Cliente.endereco, Cliente.email)
+# Chave única violada (nome no MySQL/SQLite ou constraint do PostgreSQL) -> campo do cliente
+_UNIQUE_KEY_FIELD = {'cpf': 'cpf', 'email': 'email', 'cliente_cpf_key': 'cpf', 'cliente_email_key': 'email'}
+_FIELD_LABEL = {'cpf': 'CPF', 'email': 'Email'}
+# Campos opcionais do cliente (texto ou nulo)
+_CAMPOS_OPCIONAIS = ('telefone', 'endereco', 'email')
+# Tamanho do lote de linhas buscado do cursor na listagem em streaming
+_STREAM_BATCH = 1000
+# Filtros permitidos (incluindo 'email') -> (coluna, usa ilike), montado uma vez na importação.
+# ilike (busca por trecho) para nome/endereco/email: o curinga inicial não usa índice B-tree;
+# busca exata para cpf/telefone (ambos indexados)
+_FILTER_ATTR_MAP = {
+    'nome': (Cliente.nome, True),
+    'endereco': (Cliente.endereco, True),
+    'email': (Cliente.email, True),
+    'cpf': (Cliente.cpf, False),
+    'telefone': (Cliente.telefone, False),
+}
+# Campos graváveis em PUT/PATCH
+_UPDATABLE_FIELDS = ('nome', 'cpf', 'telefone', 'endereco', 'email')
+
+def _erro_de_unicidade(e, cliente_data, motivo):
+    """APIError para um IntegrityError de CPF/Email duplicado, ou None se não for de unicidade."""
+    chave = unique_violation_key(e)
+    if chave is None:
+        return None
+    campo = _UNIQUE_KEY_FIELD.get(chave)
+    if campo is None:
+        return APIError(ErrorCode.DUP_OR_INVALID, "Erro: Violação de restrição de unicidade (CPF ou Email).")
+    return APIError(ErrorCode.DUP_OR_INVALID, f"Erro: {_FIELD_LABEL[campo]} '{cliente_data.get(campo)}' {motivo}")
+
+def _apply_filters(stmt, filters):
+    """
+    Acrescenta ao lambda_stmt as condições WHERE dos filtros de Cliente (nomes em minúsculo).
+    Cada lambda entra no cache de instruções pela posição no código e pela coluna; os valores
+    viram parâmetros ligados. Assim nem a árvore da consulta é remontada a cada requisição:
+    só os parâmetros mudam para o mesmo conjunto de filtros.
+    """
     for key, value in filters.items():
-        if key in allowed_filters and value:
-            model_attr = getattr(Cliente, key, None)
-            if model_attr:
-                # Usa ilike para nome/endereco/email
-                if key in ['nome', 'endereco', 'email']:
-                    query = query.filter(model_attr.ilike(f"%{value}%"))
-                else: # Busca exata para cpf/telefone
-                    query = query.filter(model_attr == value)
-    return query
+        filtro = _FILTER_ATTR_MAP.get(key)
+        if not filtro or not value:
+            continue
+        model_attr, use_ilike = filtro
+        if use_ilike:
+            padrao = f"%{value}%"
+            stmt += lambda s: s.where(model_attr.ilike(padrao))
+        else:
+            stmt += lambda s: s.where(model_attr == value)
+    return stmt
 
 def get_all_clientes_service(filters=None):
-    """Busca todos os clientes, aplicando filtros opcionais."""
+    """
+    Busca todos os clientes, aplicando filtros opcionais. Retorna um iterador de dicts.
+    Leitura pura: seleciona só as colunas (linhas do Core), sem montar instâncias de Cliente.
+    """
     try:
-        query = Cliente.query
+        stmt = lambda_stmt(lambda: select(*_LIST_COLUMNS))
         if filters:
-            query = _build_sqlalchemy_filters(query, filters)
-        clientes = query.all()
-        # O to_dict() no modelo já inclui o email
-        return [cliente.to_dict() for cliente in clientes], None
+            stmt = _apply_filters(stmt, filters)
+        # execute() roda a query aqui (erros de banco caem no except); cada linha vira dict
+        # sob demanda, à medida que a resposta é enviada. yield_per usa um cursor do lado do
+        # servidor (stream_results) e busca as linhas em lotes: a memória fica O(lote), não O(N)
+        rows = db.session.execute(stmt, execution_options={'yield_per': _STREAM_BATCH})
+        return (row._asdict() for row in rows)
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar clientes: {e}")
-        return None, f"Erro de banco de dados ao buscar clientes: {e}"
+        log.exception("Erro SQLAlchemy ao buscar clientes")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar clientes: {e}")
 
 def count_clientes_service(filters=None):
     """Conta o número total de clientes, aplicando filtros opcionais."""
     try:
-        query = db.session.query(db.func.count(Cliente.id))
+        # Um único SELECT COUNT(*) ... WHERE, sem o subselect que Query.count() gera
+        stmt = lambda_stmt(lambda: select(func.count()).select_from(Cliente))
         if filters:
-            count_query = Cliente.query
-            count_query = _build_sqlalchemy_filters(count_query, filters)
-            count = count_query.count()
-        else:
-            count = query.scalar()
-        return count, None
+            stmt = _apply_filters(stmt, filters)
+        return db.session.execute(stmt).scalar_one()
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao contar clientes: {e}")
-        return None, f"Erro de banco de dados ao contar clientes: {e}"
+        log.exception("Erro SQLAlchemy ao contar clientes")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao contar clientes: {e}")
 
 def get_cliente_by_id_service(cliente_id):
     """Busca um cliente específico pelo seu ID."""
     try:
-        cliente = Cliente.query.get(cliente_id)
+        cliente = db.session.get(Cliente, cliente_id)
         if cliente:
-            return cliente.to_dict(), None # to_dict() inclui email
+            return cliente.to_dict() # to_dict() inclui email
         else:
-            return None, None
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Cliente não encontrado.")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar cliente por ID: {e}")
-        return None, f"Erro de banco de dados ao buscar cliente por ID: {e}"
+        log.exception("Erro SQLAlchemy ao buscar cliente por ID")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar cliente por ID: {e}")
 
 def create_cliente_service(cliente_data):
     """Cria um novo cliente, incluindo o campo opcional 'email'."""
     required_fields = ['nome', 'cpf']
     if not all(field in cliente_data and cliente_data[field] for field in required_fields):
-        return None, "Erro: Campos obrigatórios ausentes ou vazios (nome, cpf)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Campos obrigatórios ausentes ou vazios (nome, cpf).")
 
     # Cria instância incluindo o email (usa .get() pois é nullable)
     novo_cliente = Cliente(
@@ -82,98 +125,195 @@ def create_cliente_service(cliente_data):
     try:
         db.session.add(novo_cliente)
         db.session.commit()
-        return novo_cliente.to_dict(), None
+        return novo_cliente.to_dict()
+    except IntegrityError as e:
+        db.session.rollback()
+        log.warning("Erro de Integridade ao criar cliente: %s", e)
+        # Verifica qual chave única falhou (CPF ou Email)
+        erro = _erro_de_unicidade(e, cliente_data, "já cadastrado.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        log.exception("Erro SQLAlchemy ao criar cliente")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar cliente: {e}")
+
+def _preflight_unique(cpfs, emails):
+    """
+    CPFs e emails (dentre os informados) que já estão cadastrados, em um único SELECT pelos
+    índices únicos. Só uma verificação prévia para o lote: o IntegrityError continua sendo a
+    garantia final contra inserções concorrentes.
+    """
+    condicoes = []
+    if cpfs:
+        condicoes.append(Cliente.cpf.in_(cpfs))
+    if emails:
+        condicoes.append(Cliente.email.in_(emails))
+    if not condicoes:
+        return set(), set()
+    cpfs_existentes, emails_existentes = set(), set()
+    for cpf, email in db.session.execute(select(Cliente.cpf, Cliente.email).where(or_(*condicoes))):
+        if cpf in cpfs:
+            cpfs_existentes.add(cpf)
+        if email in emails:
+            emails_existentes.add(email)
+    return cpfs_existentes, emails_existentes
+
+def _campos_texto(cliente_data):
+    """nome/cpf são texto e os opcionais (telefone, endereco, email) são texto ou nulos."""
+    return (isinstance(cliente_data['nome'], str) and isinstance(cliente_data['cpf'], str)
+            and all(isinstance(cliente_data.get(campo), (str, type(None))) for campo in _CAMPOS_OPCIONAIS))
+
+def create_clientes_batch_service(clientes_data):
+    """
+    Cria vários clientes em uma única transação, com um único INSERT (executemany) em vez de
+    um add + commit por cliente. CPFs/emails já cadastrados são verificados com uma consulta IN
+    cada; itens inválidos ou repetidos no lote são devolvidos em 'erros', com o índice no lote.
+    """
+    if len(clientes_data) > BATCH_MAX:
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro: O lote excede o limite de {BATCH_MAX} registros.")
+
+    erros = []
+    validos = [] # (indice, dados)
+    for indice, cliente_data in enumerate(clientes_data):
+        if not isinstance(cliente_data, dict):
+            erros.append({"indice": indice, "message": "Erro: Formato inválido para cliente."})
+        elif not (cliente_data.get('nome') and cliente_data.get('cpf')):
+            erros.append({"indice": indice, "message": "Erro: Campos obrigatórios ausentes ou vazios (nome, cpf)."})
+        elif not _campos_texto(cliente_data):
+            erros.append({"indice": indice, "message": "Erro: Os campos do cliente devem ser texto."})
+        else:
+            validos.append((indice, cliente_data))
+
+    try:
+        cpfs = {cliente_data['cpf'] for _, cliente_data in validos}
+        emails = {cliente_data['email'] for _, cliente_data in validos if cliente_data.get('email')}
+        cpfs_existentes, emails_existentes = _preflight_unique(cpfs, emails)
+
+        novos = []
+        cpfs_vistos, emails_vistos = set(), set()
+        for indice, cliente_data in validos:
+            cpf, email = cliente_data['cpf'], cliente_data.get('email')
+            if cpf in cpfs_existentes:
+                erros.append({"indice": indice, "message": f"Erro: CPF '{cpf}' já cadastrado."})
+            elif cpf in cpfs_vistos:
+                erros.append({"indice": indice, "message": f"Erro: CPF '{cpf}' repetido no lote."})
+            elif email and email in emails_existentes:
+                erros.append({"indice": indice, "message": f"Erro: Email '{email}' já cadastrado."})
+            elif email and email in emails_vistos:
+                erros.append({"indice": indice, "message": f"Erro: Email '{email}' repetido no lote."})
+            else:
+                cpfs_vistos.add(cpf)
+                if email:
+                    emails_vistos.add(email)
+                novos.append({
+                    'nome': cliente_data['nome'],
+                    'cpf': cpf,
+                    'telefone': cliente_data.get('telefone'),
+                    'endereco': cliente_data.get('endereco'),
+                    'email': email
+                })
+
+        criados = []
+        if novos:
+            db.session.execute(insert(Cliente), novos)
+            # MySQL não tem RETURNING: os IDs gerados são lidos de volta pelo CPF (único)
+            criados = [
+                row._asdict()
+                for row in db.session.execute(
+                    select(*_LIST_COLUMNS).where(Cliente.cpf.in_(cpfs_vistos)).order_by(Cliente.id)
+                )
+            ]
+            db.session.commit()
+        erros.sort(key=lambda erro: erro["indice"])
+        return {"criados": criados, "erros": erros}
     except IntegrityError as e:
+        # Ex: CPF/email inserido por outra requisição entre a verificação e o INSERT
         db.session.rollback()
-        print(f"Erro de Integridade ao criar cliente: {e}")
-        # Verifica qual constraint falhou (CPF ou Email)
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            if cliente_data.get('cpf') and f"'{cliente_data.get('cpf')}'" in str(e):
-                return None, f"Erro: CPF '{cliente_data.get('cpf')}' já cadastrado."
-            if cliente_data.get('email') and f"'{cliente_data.get('email')}'" in str(e):
-                return None, f"Erro: Email '{cliente_data.get('email')}' já cadastrado."
-            return None, "Erro: Violação de restrição de unicidade (CPF ou Email)." # Genérico se não conseguir identificar
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao criar lote de clientes: %s", e)
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Violação de restrição de unicidade (CPF ou Email).")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao criar cliente: {e}")
-        return None, f"Erro de banco de dados ao criar cliente: {e}"
+        log.exception("Erro SQLAlchemy ao criar lote de clientes")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar lote de clientes: {e}")
+
+def _update_cliente(cliente_id, valores):
+    """
+    Atualiza o cliente com um único UPDATE (sem SELECT prévio via get) e devolve o dict do cliente.
+    Com RETURNING (SQLite, PostgreSQL) a linha atualizada volta no próprio UPDATE. MySQL não tem
+    RETURNING: rowcount 0 significa 404 e, se o UPDATE não cobriu todas as colunas (PATCH),
+    as demais são lidas com um SELECT de colunas na mesma transação.
+    """
+    stmt = (
+        update(Cliente)
+        .where(Cliente.id == cliente_id)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(stmt.returning(*_LIST_COLUMNS)).first()
+        if row is None:
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Cliente não encontrado.")
+        return row._asdict()
+
+    if db.session.execute(stmt).rowcount == 0:
+        raise APIError(ErrorCode.NOT_FOUND, "Erro: Cliente não encontrado.")
+    if len(valores) == len(_UPDATABLE_FIELDS):
+        return {'id': cliente_id, **{field: valores[field] for field in _UPDATABLE_FIELDS}}
+    return db.session.execute(select(*_LIST_COLUMNS).where(Cliente.id == cliente_id)).one()._asdict()
 
 def update_cliente_service(cliente_id, cliente_data):
     """Atualiza todos os dados de um cliente (PUT), incluindo 'email'."""
     # Adiciona 'email' aos campos esperados para PUT (mesmo sendo nullable)
     required_fields = ['nome', 'cpf', 'telefone', 'endereco', 'email']
     if not all(field in cliente_data for field in required_fields):
-        return None, "Erro: Para PUT, todos os campos devem ser enviados (nome, cpf, telefone, endereco, email)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Para PUT, todos os campos devem ser enviados (nome, cpf, telefone, endereco, email).")
 
     try:
-        cliente = Cliente.query.get(cliente_id)
-        if not cliente:
-            return None, "Erro: Cliente não encontrado."
-
         # Atualiza todos os campos, incluindo email
-        cliente.nome = cliente_data['nome']
-        cliente.cpf = cliente_data['cpf']
-        cliente.telefone = cliente_data.get('telefone')
-        cliente.endereco = cliente_data.get('endereco')
-        cliente.email = cliente_data.get('email') # Atualiza email
-
+        resultado = _update_cliente(cliente_id, {field: cliente_data[field] for field in _UPDATABLE_FIELDS})
         db.session.commit()
-        return cliente.to_dict(), None
+        return resultado
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao atualizar cliente (PUT): {e}")
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            # Verifica qual campo duplicou
-            if cliente_data.get('cpf') and f"'{cliente_data.get('cpf')}'" in str(e):
-                return None, f"Erro: CPF '{cliente_data.get('cpf')}' já pertence a outro cliente."
-            if cliente_data.get('email') and f"'{cliente_data.get('email')}'" in str(e):
-                return None, f"Erro: Email '{cliente_data.get('email')}' já pertence a outro cliente."
-            return None, "Erro: Violação de restrição de unicidade (CPF ou Email)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao atualizar cliente (PUT): %s", e)
+        # Verifica qual campo duplicou
+        erro = _erro_de_unicidade(e, cliente_data, "já pertence a outro cliente.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao atualizar cliente (PUT): {e}")
-        return None, f"Erro de banco de dados ao atualizar cliente: {e}"
+        log.exception("Erro SQLAlchemy ao atualizar cliente (PUT)")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar cliente: {e}")
 
 def patch_cliente_service(cliente_id, cliente_data):
     """Atualiza parcialmente um cliente (PATCH), permitindo atualizar 'email'."""
     if not cliente_data:
-        return None, "Erro: Nenhum dado fornecido para atualização (PATCH)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum dado fornecido para atualização (PATCH).")
 
-    try:
-        cliente = Cliente.query.get(cliente_id)
-        if not cliente:
-            return None, "Erro: Cliente não encontrado."
-
-        updated = False
-        # Adiciona 'email' aos campos permitidos para PATCH
-        allowed_fields = ['nome', 'cpf', 'telefone', 'endereco', 'email']
-        for key, value in cliente_data.items():
-            if key in allowed_fields and hasattr(cliente, key):
-                setattr(cliente, key, value)
-                updated = True
-
-        if not updated:
-            return None, "Erro: Nenhum campo válido fornecido para atualização (PATCH)."
+    # Só os campos permitidos (incluindo 'email') entram no UPDATE
+    valores = {key: value for key, value in cliente_data.items() if key in _UPDATABLE_FIELDS}
+    if not valores:
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum campo válido fornecido para atualização (PATCH).")
 
+    try:
+        resultado = _update_cliente(cliente_id, valores)
         db.session.commit()
-        return cliente.to_dict(), None
+        return resultado
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao atualizar cliente (PATCH): {e}")
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            # Verifica qual campo duplicou
-            if 'cpf' in cliente_data and f"'{cliente_data.get('cpf')}'" in str(e):
-                return None, f"Erro: CPF '{cliente_data.get('cpf')}' já pertence a outro cliente."
-            if 'email' in cliente_data and f"'{cliente_data.get('email')}'" in str(e):
-                return None, f"Erro: Email '{cliente_data.get('email')}' já pertence a outro cliente."
-            return None, "Erro: Violação de restrição de unicidade (CPF ou Email)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao atualizar cliente (PATCH): %s", e)
+        # Verifica qual campo duplicou
+        erro = _erro_de_unicidade(e, cliente_data, "já pertence a outro cliente.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao atualizar cliente (PATCH): {e}")
-        return None, f"Erro de banco de dados ao atualizar cliente: {e}"
+        log.exception("Erro SQLAlchemy ao atualizar cliente (PATCH)")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar cliente: {e}")
 
 # A função delete_cliente_service não precisa de alterações diretas
 # para suportar a coluna email, mas o tratamento de erro de integridade
@@ -181,26 +321,27 @@ def patch_cliente_service(cliente_id, cliente_data):
 def delete_cliente_service(cliente_id):
     """Deleta um cliente."""
     try:
-        cliente = Cliente.query.get(cliente_id)
+        cliente = db.session.get(Cliente, cliente_id)
         if not cliente:
-            return None, "Erro: Cliente não encontrado."
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Cliente não encontrado.")
 
         # Verificação de dependência (exemplo)
         # from app.models.pedido import Pedido
         # if Pedido.query.filter_by(cliente_id=cliente_id).first():
-        #     return None, "Erro: Não é possível excluir cliente pois ele possui pedidos associados."
+        #     raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Não é possível excluir cliente pois ele possui pedidos associados.")
 
         db.session.delete(cliente)
         db.session.commit()
-        return {"message": f"Cliente com ID {cliente_id} deletado com sucesso."}, None
+        return {"message": f"Cliente com ID {cliente_id} deletado com sucesso."}
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao deletar cliente: {e}")
-        if 'FOREIGN KEY constraint fails' in str(e):
-            return None, "Erro: Não é possível excluir cliente pois ele possui registros dependentes (ex: pedidos)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao deletar cliente: %s", e)
+        # MySQL: "a foreign key constraint fails"; SQLite: "FOREIGN KEY constraint failed"
+        if 'foreign key constraint fail' in str(e).lower():
+            raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Não é possível excluir cliente pois ele possui registros dependentes (ex: pedidos).")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao deletar cliente: {e}")
-        return None, f"Erro de banco de dados ao deletar cliente: {e}"
+        log.exception("Erro SQLAlchemy ao deletar cliente")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao deletar cliente: {e}")
 
@@ -1,33 +1,99 @@
 # ./app/services/pedido_service.py
 # Contém a lógica de negócio para a entidade Pedido, usando SQLAlchemy.
+# Os serviços retornam o resultado diretamente e levantam APIError (com um ErrorCode) em caso de erro.
 
+import logging
+from dataclasses import dataclass
+from sqlalchemy import Float, delete, func, insert, select, type_coerce
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import joinedload, selectinload # Para otimizar carregamento de relacionamentos
-from decimal import Decimal, InvalidOperation
-from datetime import datetime
+from sqlalchemy.orm import joinedload, raiseload, selectinload # Para otimizar carregamento de relacionamentos
+from datetime import datetime, time, timedelta
 
-from app import db
-from app.models.pedido import Pedido
+from app import db, cache, BATCH_MAX, YIELD_PER
+from app.errors import APIError, ErrorCode
+from app.models.pedido import Pedido, _ZERO
 from app.models.cliente import Cliente
 from app.models.produto import Produto
 from app.models.pedido_produto import PedidoProduto
 
+log = logging.getLogger(__name__)
+
 # --- Funções Auxiliares ---
 
 def _buscar_cliente_ou_erro(cliente_id):
     """Busca um cliente pelo ID ou retorna erro."""
-    cliente = Cliente.query.get(cliente_id)
+    cliente = db.session.get(Cliente, cliente_id)
     if not cliente:
         raise ValueError(f"Cliente com ID {cliente_id} não encontrado.")
     return cliente
 
 def _buscar_produto_ou_erro(produto_id):
-    """Busca um produto pelo ID ou retorna erro."""
-    produto = Produto.query.get(produto_id)
+    """Busca um produto pelo ID ou levanta APIError 404 (rota de item: produto inexistente é 404)."""
+    produto = db.session.get(Produto, produto_id)
     if not produto:
-        raise ValueError(f"Produto com ID {produto_id} não encontrado.")
+        raise APIError(ErrorCode.NOT_FOUND, f"Produto com ID {produto_id} não encontrado.")
     return produto
 
+_UM_DIA = timedelta(days=1)
+
+# Colunas da listagem sem itens, na ordem/nomes do Pedido.to_dict()
+# valor_total sai como float já no processamento do resultado (como o float() do to_dict)
+_LIST_COLUMNS = (
+    Pedido.id, Pedido.data_criacao, Pedido.data_atualizacao, Pedido.cliente_id,
+    Pedido.nome_cliente, Pedido.cpf_cliente, Pedido.endereco_entrega, Pedido.telefone_contato,
+    Pedido.email_pedido, Pedido.qtd_total, type_coerce(Pedido.valor_total, Float).label('valor_total')
+)
+
+@dataclass(slots=True)
+class PedidoResumo:
+    """
+    Linha da listagem sem itens, no formato do Pedido.to_dict(). O orjson serializa dataclasses
+    (e datetimes, em ISO 8601) nativamente, sem montar um dict por linha.
+    """
+    id: int
+    data_criacao: datetime
+    data_atualizacao: datetime
+    cliente_id: int
+    nome_cliente: str
+    cpf_cliente: str
+    endereco_entrega: str | None
+    telefone_contato: str | None
+    email_pedido: str | None
+    qtd_total: int
+    valor_total: float
+
+def _invalidar_cache_listagem():
+    """Descarta as contagens memoizadas (chamado após cada escrita confirmada)."""
+    cache.delete_memoized(count_pedidos_service)
+
+def _invalidar_cache_pedido(pedido_id):
+    """Descarta o detalhe memoizado de um pedido (com e sem itens) após alterá-lo."""
+    cache.delete_memoized(_get_pedido_memoizado, pedido_id, False)
+    cache.delete_memoized(_get_pedido_memoizado, pedido_id, True)
+
+def _pedido_loader_options(include_items=False, include_cliente_atual=False, um_pedido=False):
+    """
+    Opções de carregamento para o que o Pedido.to_dict() vai acessar: os itens vêm em uma
+    consulta IN (selectinload) e o cliente no próprio SELECT (joinedload), em vez de um
+    lazy load por pedido (N+1).
+    Para um único pedido (um_pedido), os itens também vêm no mesmo SELECT (LEFT JOIN): pedido,
+    itens e cliente em uma ida ao banco, sem a linha do pedido se repetir por muitos pedidos.
+    """
+    options = []
+    if include_items:
+        options.append(joinedload(Pedido.produtos_associados) if um_pedido else selectinload(Pedido.produtos_associados))
+    if include_cliente_atual:
+        options.append(joinedload(Pedido.cliente))
+    return options
+
+def _buscar_pedido_com_itens(pedido_id):
+    """Pedido com a coleção de itens já carregada (um SELECT com JOIN), ou None."""
+    return db.session.get(Pedido, pedido_id, options=_pedido_loader_options(include_items=True, um_pedido=True))
+
+def _item_do_pedido(pedido, produto_id):
+    """Item do pedido para o produto, procurado na coleção já carregada."""
+    return next((item for item in pedido.produtos_associados if item.produto_id == produto_id), None)
+
 def _validar_item_pedido(item_data):
     """Valida os dados de um item do pedido."""
     if not isinstance(item_data, dict):
@@ -40,6 +106,30 @@ def _validar_item_pedido(item_data):
         raise ValueError(f"Quantidade inválida ou ausente para o produto ID {produto_id}.")
     return produto_id, quantidade
 
+def _linha_item(produto, quantidade):
+    """Linha de PedidoProduto (com o snapshot do produto) para o INSERT em lote dos itens."""
+    return {
+        'produto_id': produto.id,
+        'quantidade': quantidade,
+        # Snapshots do produto
+        'nome_produto': produto.nome,
+        'ean_produto': produto.ean,
+        'valor_unitario': produto.valor # Valor no momento da criação
+    }
+
+def _totais_dos_itens(itens_linhas):
+    """(qtd_total, valor_total) somados a partir das linhas dos itens, sem consultar o banco."""
+    return (
+        sum(linha['quantidade'] for linha in itens_linhas),
+        sum((linha['quantidade'] * linha['valor_unitario'] for linha in itens_linhas), _ZERO)
+    )
+
+def _pedido_criado_dict(pedido, itens_linhas):
+    """Serializa um pedido recém-criado com os itens montados a partir das linhas inseridas."""
+    resultado = pedido.to_dict()
+    resultado['itens'] = [PedidoProduto(**linha).to_dict() for linha in itens_linhas]
+    return resultado
+
 # --- Serviços Principais ---
 
 def create_pedido_service(pedido_data):
@@ -53,9 +143,9 @@ def create_pedido_service(pedido_data):
     itens_data = pedido_data.get('itens')
 
     if not cliente_id:
-        return None, "Erro: ID do cliente é obrigatório."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: ID do cliente é obrigatório.")
     if not itens_data or not isinstance(itens_data, list) or not itens_data:
-        return None, "Erro: Lista de itens do pedido está vazia ou inválida."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Lista de itens do pedido está vazia ou inválida.")
 
     try:
         # 1. Buscar Cliente e obter dados para snapshot
@@ -65,7 +155,27 @@ def create_pedido_service(pedido_data):
         telefone_contato = pedido_data.get('telefone_contato', cliente.telefone)
         email_pedido = pedido_data.get('email_pedido', cliente.email)
 
-        # 2. Criar o objeto Pedido (ainda sem totais)
+        # 2. Processar Itens: valida todos e depois busca os produtos com uma única consulta IN
+        itens = []
+        produtos_processados = set() # Para evitar duplicidade de produto no mesmo pedido inicial
+        for item_data in itens_data:
+            produto_id, quantidade = _validar_item_pedido(item_data)
+
+            if produto_id in produtos_processados:
+                raise ValueError(f"Produto ID {produto_id} listado mais de uma vez no pedido inicial.")
+            produtos_processados.add(produto_id)
+            itens.append((produto_id, quantidade))
+
+        produtos = {p.id: p for p in Produto.query.filter(Produto.id.in_(produtos_processados))}
+        itens_linhas = [] # Linhas de PedidoProduto (snapshot do produto)
+        for produto_id, quantidade in itens:
+            produto = produtos.get(produto_id)
+            if not produto:
+                raise ValueError(f"Produto com ID {produto_id} não encontrado.")
+            itens_linhas.append(_linha_item(produto, quantidade))
+
+        # 3. Criar o Pedido já com os totais, somados a partir das linhas dos itens
+        qtd_total, valor_total = _totais_dos_itens(itens_linhas)
         novo_pedido = Pedido(
             cliente_id=cliente.id,
             nome_cliente=cliente.nome, # Snapshot
@@ -73,167 +183,265 @@ def create_pedido_service(pedido_data):
             endereco_entrega=endereco_entrega,
             telefone_contato=telefone_contato,
             email_pedido=email_pedido,
-            qtd_total=0, # Será calculado
-            valor_total=Decimal('0.00') # Será calculado
+            qtd_total=qtd_total,
+            valor_total=valor_total
         )
         db.session.add(novo_pedido)
-        # Flush para obter o ID do pedido antes de criar os itens, se necessário,
-        # mas podemos adicionar os itens antes do commit final.
-        # db.session.flush()
+        # Flush para obter o ID do pedido, usado como chave dos itens
+        db.session.flush()
 
-        # 3. Processar Itens e criar PedidoProduto
-        itens_pedido_obj = []
-        produtos_processados = set() # Para evitar duplicidade de produto no mesmo pedido inicial
-        for item_data in itens_data:
-            produto_id, quantidade = _validar_item_pedido(item_data)
+        # 4. Grava todos os itens com um único INSERT (executemany), fora do unit of work
+        for linha in itens_linhas:
+            linha['pedido_id'] = novo_pedido.id
+        db.session.execute(insert(PedidoProduto), itens_linhas)
 
-            if produto_id in produtos_processados:
-                raise ValueError(f"Produto ID {produto_id} listado mais de uma vez no pedido inicial.")
-            produtos_processados.add(produto_id)
-
-            produto = _buscar_produto_ou_erro(produto_id)
-
-            item_pedido = PedidoProduto(
-                pedido=novo_pedido, # Associa ao pedido criado
-                produto=produto,   # Associa ao produto buscado
-                quantidade=quantidade,
-                # Snapshots do produto
-                nome_produto=produto.nome,
-                ean_produto=produto.ean,
-                valor_unitario=produto.valor # Valor no momento da criação
-            )
-            itens_pedido_obj.append(item_pedido)
-            # Adiciona diretamente à coleção do pedido (se configurado corretamente)
-            # novo_pedido.produtos_associados.append(item_pedido) # SQLAlchemy cuida disso
-
-        # Adiciona todos os itens à sessão
-        db.session.add_all(itens_pedido_obj)
-
-        # 4. Calcular Totais e atualizar Pedido
-        # É importante fazer isso *depois* que os itens foram criados e associados
-        # na sessão, mas *antes* do commit final.
-        novo_pedido.calcular_e_atualizar_totais()
+        # Serializa antes do commit (que expira os objetos), sem recarregar a coleção do banco
+        resultado = _pedido_criado_dict(novo_pedido, itens_linhas)
 
         # 5. Commit da Transação
         db.session.commit()
+        _invalidar_cache_listagem()
 
         # Retorna o pedido criado, incluindo os itens
-        return novo_pedido.to_dict(include_items=True), None
+        return resultado
 
     except ValueError as ve: # Captura erros de validação (cliente/produto não encontrado, item inválido)
         db.session.rollback()
-        print(f"Erro de validação ao criar pedido: {ve}")
-        return None, f"Erro de validação: {ve}"
+        log.warning("Erro de validação ao criar pedido: %s", ve)
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro de validação: {ve}")
     except IntegrityError as e: # Captura erros de integridade do DB
         db.session.rollback()
-        print(f"Erro de Integridade ao criar pedido: {e}")
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao criar pedido: %s", e)
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e: # Captura outros erros do SQLAlchemy
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao criar pedido: {e}")
-        return None, f"Erro de banco de dados ao criar pedido: {e}"
+        log.exception("Erro SQLAlchemy ao criar pedido")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar pedido: {e}")
+
+def _validar_pedido_lote(pedido_data):
+    """Valida um pedido do lote (sem acessar o banco). Retorna (cliente_id, [(produto_id, quantidade)])."""
+    if not isinstance(pedido_data, dict):
+        raise ValueError("Formato inválido para pedido.")
+    cliente_id = pedido_data.get('cliente_id')
+    itens_data = pedido_data.get('itens')
+    if not cliente_id:
+        raise ValueError("ID do cliente é obrigatório.")
+    if not itens_data or not isinstance(itens_data, list):
+        raise ValueError("Lista de itens do pedido está vazia ou inválida.")
+
+    itens = []
+    produtos_processados = set()
+    for item_data in itens_data:
+        produto_id, quantidade = _validar_item_pedido(item_data)
+        if produto_id in produtos_processados:
+            raise ValueError(f"Produto ID {produto_id} listado mais de uma vez no pedido inicial.")
+        produtos_processados.add(produto_id)
+        itens.append((produto_id, quantidade))
+    return cliente_id, itens
+
+def create_pedidos_batch_service(pedidos_data):
+    """
+    Cria vários pedidos em uma única transação (um commit para o lote todo).
+    Clientes e produtos de todo o lote são buscados com uma consulta IN cada. Pedidos inválidos
+    são devolvidos em 'erros', com o índice no lote; os demais são criados.
+    """
+    if len(pedidos_data) > BATCH_MAX:
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro: O lote excede o limite de {BATCH_MAX} registros.")
+
+    erros = []
+    validos = [] # (indice, dados, cliente_id, itens)
+    for indice, pedido_data in enumerate(pedidos_data):
+        try:
+            cliente_id, itens = _validar_pedido_lote(pedido_data)
+        except ValueError as ve:
+            erros.append({"indice": indice, "message": f"Erro de validação: {ve}"})
+            continue
+        validos.append((indice, pedido_data, cliente_id, itens))
+
+    try:
+        cliente_ids = {cliente_id for _, _, cliente_id, _ in validos}
+        produto_ids = {produto_id for _, _, _, itens in validos for produto_id, _ in itens}
+        clientes = {c.id: c for c in Cliente.query.filter(Cliente.id.in_(cliente_ids))} if cliente_ids else {}
+        produtos = {p.id: p for p in Produto.query.filter(Produto.id.in_(produto_ids))} if produto_ids else {}
+
+        novos_pedidos = []
+        for indice, pedido_data, cliente_id, itens in validos:
+            cliente = clientes.get(cliente_id)
+            if not cliente:
+                erros.append({"indice": indice, "message": f"Erro de validação: Cliente com ID {cliente_id} não encontrado."})
+                continue
+            faltando = next((produto_id for produto_id, _ in itens if produto_id not in produtos), None)
+            if faltando is not None:
+                erros.append({"indice": indice, "message": f"Erro de validação: Produto com ID {faltando} não encontrado."})
+                continue
+
+            itens_linhas = [_linha_item(produtos[produto_id], quantidade) for produto_id, quantidade in itens]
+            qtd_total, valor_total = _totais_dos_itens(itens_linhas)
+            novo_pedido = Pedido(
+                cliente_id=cliente.id,
+                nome_cliente=cliente.nome, # Snapshot
+                cpf_cliente=cliente.cpf,    # Snapshot
+                endereco_entrega=pedido_data.get('endereco_entrega', cliente.endereco),
+                telefone_contato=pedido_data.get('telefone_contato', cliente.telefone),
+                email_pedido=pedido_data.get('email_pedido', cliente.email),
+                qtd_total=qtd_total,
+                valor_total=valor_total
+            )
+            novos_pedidos.append((novo_pedido, itens_linhas))
+
+        db.session.add_all(pedido for pedido, _ in novos_pedidos)
+        # Flush para gerar os IDs dos pedidos; os itens de todo o lote vão em um único INSERT
+        db.session.flush()
+        todas_linhas = []
+        for pedido, itens_linhas in novos_pedidos:
+            for linha in itens_linhas:
+                linha['pedido_id'] = pedido.id
+            todas_linhas.extend(itens_linhas)
+        if todas_linhas:
+            db.session.execute(insert(PedidoProduto), todas_linhas)
+        # Serializa antes do commit, que expira os objetos
+        criados = [_pedido_criado_dict(pedido, itens_linhas) for pedido, itens_linhas in novos_pedidos]
+        db.session.commit()
+        if criados:
+            _invalidar_cache_listagem()
+        erros.sort(key=lambda erro: erro["indice"])
+        return {"criados": criados, "erros": erros}
+    except IntegrityError as e:
+        db.session.rollback()
+        log.warning("Erro de Integridade ao criar lote de pedidos: %s", e)
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        log.exception("Erro SQLAlchemy ao criar lote de pedidos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar lote de pedidos: {e}")
+
+def _parse_pedido_filters(filters):
+    """
+    Converte os filtros de pedido em (cliente_id, dt_inicio, dt_fim_exclusivo); valores
+    inválidos viram None e o filtro é ignorado. data_fim inclui o dia inteiro: o limite é o
+    início do dia seguinte (data_criacao < dt_fim_exclusivo).
+    """
+    cliente_id = dt_inicio = dt_fim_exclusivo = None
+    try:
+        cliente_id = int(filters['cliente_id']) if filters.get('cliente_id') else None
+    except ValueError:
+        pass # Ignora filtro se cliente_id inválido
+    try:
+        dt_inicio = datetime.fromisoformat(filters['data_inicio']) if filters.get('data_inicio') else None
+    except ValueError:
+        pass # Ignora filtro se data inválida
+    try:
+        if filters.get('data_fim'):
+            dt_fim_exclusivo = datetime.combine(datetime.fromisoformat(filters['data_fim']).date() + _UM_DIA, time.min)
+    except ValueError:
+        pass # Ignora filtro se data inválida
+    return cliente_id, dt_inicio, dt_fim_exclusivo
+
+_HINT_CLIENTE_DATA = 'USE INDEX (ix_pedido_cliente_data)'
+
+def _apply_pedido_filters(stmt, filters):
+    """Aplica os filtros de pedido (cliente_id, data_inicio, data_fim) a uma query ou select."""
+    cliente_id, dt_inicio, dt_fim_exclusivo = _parse_pedido_filters(filters)
+    if cliente_id is not None:
+        # No MySQL, garante o índice (cliente_id, data_criacao): filtro por cliente, faixa de datas
+        # e ORDER BY data_criacao em um range scan, sem filesort (outros bancos ignoram o hint)
+        stmt = stmt.where(Pedido.cliente_id == cliente_id).with_hint(Pedido, _HINT_CLIENTE_DATA, 'mysql')
+    if dt_inicio is not None:
+        stmt = stmt.where(Pedido.data_criacao >= dt_inicio)
+    if dt_fim_exclusivo is not None:
+        stmt = stmt.where(Pedido.data_criacao < dt_fim_exclusivo)
+    return stmt
+
+def _listar_pedidos_core(filters):
+    """
+    Listagem sem itens/cliente: só as colunas (linhas do Core, buscadas em lotes), sem montar
+    instâncias de Pedido nem registrá-las no mapa de identidade da sessão; cada linha vira um PedidoResumo.
+    """
+    stmt = select(*_LIST_COLUMNS).order_by(Pedido.data_criacao.desc()) # Ordena pelos mais recentes
+    if filters:
+        stmt = _apply_pedido_filters(stmt, filters)
+    rows = db.session.execute(stmt, execution_options={'yield_per': YIELD_PER})
+    return (PedidoResumo(*row) for row in rows)
 
-def get_all_pedidos_service(filters=None):
-    """Busca todos os pedidos, aplicando filtros opcionais."""
+def get_all_pedidos_service(filters=None, include_items=False, include_cliente_atual=False):
+    """
+    Busca todos os pedidos, aplicando filtros opcionais. Retorna um iterador de linhas (PedidoResumo,
+    ou dicts com itens/cliente), consumido pelo controller enquanto a resposta é enviada (por isso a
+    listagem não é memoizada).
+    Itens e dados atuais do cliente, se pedidos, são carregados antecipadamente (sem N+1).
+    """
     try:
+        if not (include_items or include_cliente_atual):
+            return _listar_pedidos_core(filters)
+
         query = Pedido.query.order_by(Pedido.data_criacao.desc()) # Ordena pelos mais recentes
+        # raiseload('*'): qualquer relacionamento fora das opções de carregamento levanta erro
+        # em vez de disparar um SELECT por pedido (N+1 escondido na serialização)
+        query = query.options(*_pedido_loader_options(include_items, include_cliente_atual), raiseload('*'))
 
         if filters:
-            cliente_id = filters.get('cliente_id')
-            data_inicio = filters.get('data_inicio')
-            data_fim = filters.get('data_fim')
-
-            if cliente_id:
-                try:
-                    query = query.filter(Pedido.cliente_id == int(cliente_id))
-                except ValueError:
-                    pass # Ignora filtro se cliente_id inválido
-            if data_inicio:
-                try:
-                    dt_inicio = datetime.fromisoformat(data_inicio)
-                    query = query.filter(Pedido.data_criacao >= dt_inicio)
-                except ValueError:
-                    pass # Ignora filtro se data inválida
-            if data_fim:
-                try:
-                    # Adiciona lógica para incluir o dia inteiro na data fim
-                    dt_fim = datetime.fromisoformat(data_fim).replace(hour=23, minute=59, second=59, microsecond=999999)
-                    query = query.filter(Pedido.data_criacao <= dt_fim)
-                except ValueError:
-                    pass # Ignora filtro se data inválida
-
-        pedidos = query.all()
+            query = _apply_pedido_filters(query, filters)
+
+        # iter() executa a query aqui (erros de banco caem no except); a conversão para dict
+        # é feita sob demanda, à medida que a resposta é enviada. yield_per busca os pedidos
+        # (e os itens, via selectinload) em lotes, sem materializar todas as instâncias
+        pedidos = iter(query.yield_per(YIELD_PER))
         # Não inclui itens por padrão na listagem geral para performance
-        return [pedido.to_dict(include_items=False) for pedido in pedidos], None
+        return (pedido.to_dict(include_items, include_cliente_atual) for pedido in pedidos)
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar pedidos: {e}")
-        return None, f"Erro de banco de dados ao buscar pedidos: {e}"
+        log.exception("Erro SQLAlchemy ao buscar pedidos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar pedidos: {e}")
 
+@cache.memoize()
 def count_pedidos_service(filters=None):
     """Conta o número total de pedidos, aplicando filtros opcionais."""
     try:
-        # Query base para contagem
-        query = db.session.query(db.func.count(Pedido.id))
-        entity_query = Pedido.query # Query para aplicar filtros
-
+        # Um único SELECT COUNT(*) ... WHERE, sem o subselect (nem o ORDER BY) de Query.count()
+        stmt = select(func.count()).select_from(Pedido)
         if filters:
-            cliente_id = filters.get('cliente_id')
-            data_inicio = filters.get('data_inicio')
-            data_fim = filters.get('data_fim')
-
-            if cliente_id:
-                try:
-                    entity_query = entity_query.filter(Pedido.cliente_id == int(cliente_id))
-                except ValueError:
-                    pass
-            if data_inicio:
-                try:
-                    dt_inicio = datetime.fromisoformat(data_inicio)
-                    entity_query = entity_query.filter(Pedido.data_criacao >= dt_inicio)
-                except ValueError:
-                    pass
-            if data_fim:
-                try:
-                    dt_fim = datetime.fromisoformat(data_fim).replace(hour=23, minute=59, second=59, microsecond=999999)
-                    entity_query = entity_query.filter(Pedido.data_criacao <= dt_fim)
-                except ValueError:
-                    pass
-
-            # Conta sobre a query filtrada
-            count = entity_query.count()
-        else:
-            # Conta todos
-            count = query.scalar()
-
-        return count, None
+            stmt = _apply_pedido_filters(stmt, filters)
+        return db.session.execute(stmt).scalar_one()
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao contar pedidos: {e}")
-        return None, f"Erro de banco de dados ao contar pedidos: {e}"
+        log.exception("Erro SQLAlchemy ao contar pedidos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao contar pedidos: {e}")
 
 
-def get_pedido_by_id_service(pedido_id, include_items=False):
-    """Busca um pedido específico pelo seu ID, opcionalmente incluindo itens."""
-    try:
-        query = Pedido.query
-        if include_items:
-            # Eager loading dos itens associados para evitar múltiplas queries
-            # selectinload é geralmente bom para coleções Um-para-Muitos/Muitos-para-Muitos
-            query = query.options(selectinload(Pedido.produtos_associados))
-            # Se precisar dos detalhes do produto também dentro do item:
-            # query = query.options(selectinload(Pedido.produtos_associados).selectinload(PedidoProduto.produto))
+def get_pedido_by_id_service(pedido_id, include_items=False, include_cliente_atual=False):
+    """
+    Busca um pedido específico pelo seu ID, opcionalmente incluindo itens e os dados atuais do cliente.
+    Sem os dados do cliente, o resultado é memoizado por (pedido_id, include_items); com eles, a busca
+    vai sempre ao banco, pois as alterações do cliente não invalidam o cache de pedidos.
+    """
+    if include_cliente_atual:
+        return _buscar_pedido(pedido_id, include_items, True)
+    return _get_pedido_memoizado(pedido_id, include_items)
+
+@cache.memoize()
+def _get_pedido_memoizado(pedido_id, include_items):
+    """Detalhe memoizado; as alterações do pedido invalidam só as suas entradas."""
+    return _buscar_pedido(pedido_id, include_items, False)
 
-        pedido = query.get(pedido_id)
+def _buscar_pedido(pedido_id, include_items, include_cliente_atual):
+    """Carrega o pedido com o que o to_dict() vai acessar e o serializa."""
+    try:
+        # populate_existing: se o pedido já estiver na sessão (ex: logo após um commit), é recarregado
+        # com as opções abaixo em vez de devolvido como está pelo mapa de identidade
+        pedido = db.session.get(
+            Pedido, pedido_id,
+            options=[*_pedido_loader_options(include_items, include_cliente_atual, um_pedido=True), raiseload('*')],
+            populate_existing=True
+        )
 
         if pedido:
-            return pedido.to_dict(include_items=include_items), None
+            return pedido.to_dict(include_items=include_items, include_cliente_atual=include_cliente_atual)
         else:
-            return None, None # Não encontrado
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Pedido não encontrado.")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar pedido por ID: {e}")
-        return None, f"Erro de banco de dados ao buscar pedido por ID: {e}"
+        log.exception("Erro SQLAlchemy ao buscar pedido por ID")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar pedido por ID: {e}")
 
 # --- Serviços para Itens de Pedido (Adicionar/Atualizar/Remover) ---
 
@@ -243,21 +451,22 @@ def add_item_to_pedido_service(pedido_id, item_data):
         # Valida os dados do item
         produto_id, quantidade = _validar_item_pedido(item_data)
 
-        # Busca o pedido e o produto
-        pedido = Pedido.query.get(pedido_id)
+        # Busca o pedido já com os itens (usados nos totais e na resposta) e o produto
+        pedido = _buscar_pedido_com_itens(pedido_id)
         if not pedido:
-            return None, f"Pedido com ID {pedido_id} não encontrado."
+            raise APIError(ErrorCode.NOT_FOUND, f"Pedido com ID {pedido_id} não encontrado.")
         produto = _buscar_produto_ou_erro(produto_id)
 
         # Verifica se o produto já existe neste pedido
-        item_existente = PedidoProduto.query.filter_by(pedido_id=pedido_id, produto_id=produto_id).first()
+        item_existente = _item_do_pedido(pedido, produto_id)
         if item_existente:
             # Poderia atualizar a quantidade aqui ou retornar erro, dependendo da regra
-            # return None, f"Produto ID {produto_id} já existe no pedido {pedido_id}. Use a rota de atualização de item."
+            # raise APIError(ErrorCode.DUP_OR_INVALID, f"Produto ID {produto_id} já existe no pedido {pedido_id}. Use a rota de atualização de item.")
             # Ou atualiza a quantidade:
             item_existente.quantidade += quantidade
             # Recalcula valor unitário? Não, deve manter o do momento da *primeira* adição, ou atualizar? Decisão de negócio.
             # Vamos manter o valor unitário original e apenas somar quantidade.
+            valor_unitario = item_existente.valor_unitario
         else:
             # Cria o novo item
             novo_item = PedidoProduto(
@@ -269,90 +478,195 @@ def add_item_to_pedido_service(pedido_id, item_data):
                 valor_unitario=produto.valor
             )
             db.session.add(novo_item)
+            valor_unitario = produto.valor
 
-        # Recalcula e atualiza os totais do pedido
-        pedido.calcular_e_atualizar_totais()
+        # Atualiza os totais do pedido pelo delta do item
+        pedido.apply_item_delta(quantidade, quantidade * valor_unitario)
         # Precisamos fazer commit para salvar o item e os totais atualizados
+        # Serializa após o flush e antes do commit (que expira os objetos): o pedido já está
+        # na sessão com os itens carregados, sem precisar buscá-lo de novo
+        db.session.flush()
+        resultado = pedido.to_dict(include_items=True)
         db.session.commit()
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
 
         # Retorna o pedido atualizado com itens
-        return get_pedido_by_id_service(pedido_id, include_items=True)
+        return resultado
 
     except ValueError as ve:
         db.session.rollback()
-        return None, f"Erro de validação: {ve}"
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro de validação: {ve}")
     except IntegrityError as e:
         db.session.rollback()
-        return None, f"Erro de integridade no banco de dados: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        return None, f"Erro de banco de dados ao adicionar item: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao adicionar item: {e}")
+
+
+def add_items_to_pedido_service(pedido_id, itens_data):
+    """
+    Adiciona vários itens a um pedido existente em uma única transação.
+    Itens novos são gravados com um único INSERT (executemany); produtos que já estão no pedido
+    têm a quantidade somada, como na rota de item único. Itens inválidos voltam em 'erros'
+    com o índice na lista; os demais são gravados.
+    """
+    if len(itens_data) > BATCH_MAX:
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro: O lote excede o limite de {BATCH_MAX} registros.")
+
+    erros = []
+    validos = [] # (indice, produto_id, quantidade)
+    produtos_processados = set()
+    for indice, item_data in enumerate(itens_data):
+        try:
+            produto_id, quantidade = _validar_item_pedido(item_data)
+            if produto_id in produtos_processados:
+                raise ValueError(f"Produto ID {produto_id} listado mais de uma vez no lote.")
+        except ValueError as ve:
+            erros.append({"indice": indice, "message": f"Erro de validação: {ve}"})
+            continue
+        produtos_processados.add(produto_id)
+        validos.append((indice, produto_id, quantidade))
+
+    try:
+        # Pedido já com os itens (um SELECT com JOIN): usados para achar os existentes e na resposta
+        pedido = _buscar_pedido_com_itens(pedido_id)
+        if not pedido:
+            raise APIError(ErrorCode.NOT_FOUND, f"Pedido com ID {pedido_id} não encontrado.")
+
+        existentes = {item.produto_id: item for item in pedido.produtos_associados}
+        # Só os produtos que ainda não estão no pedido precisam ser buscados
+        produto_ids = [produto_id for _, produto_id, _ in validos if produto_id not in existentes]
+        produtos = {p.id: p for p in Produto.query.filter(Produto.id.in_(produto_ids))} if produto_ids else {}
+
+        novos_itens = []
+        qtd_adicionada = 0
+        valor_adicionado = _ZERO
+        for indice, produto_id, quantidade in validos:
+            item_existente = existentes.get(produto_id)
+            if item_existente:
+                # Mantém o valor unitário do momento da primeira adição
+                item_existente.quantidade += quantidade
+                valor_unitario = item_existente.valor_unitario
+            else:
+                produto = produtos.get(produto_id)
+                if not produto:
+                    erros.append({"indice": indice, "message": f"Erro de validação: Produto com ID {produto_id} não encontrado."})
+                    continue
+                valor_unitario = produto.valor
+                novos_itens.append({
+                    'pedido_id': pedido_id,
+                    'produto_id': produto_id,
+                    'quantidade': quantidade,
+                    'nome_produto': produto.nome,
+                    'ean_produto': produto.ean,
+                    'valor_unitario': valor_unitario
+                })
+            qtd_adicionada += quantidade
+            valor_adicionado += quantidade * valor_unitario
+
+        erros.sort(key=lambda erro: erro["indice"])
+        if not qtd_adicionada:
+            return {"pedido": None, "erros": erros}
+
+        if novos_itens:
+            db.session.execute(insert(PedidoProduto), novos_itens)
+        # Totais atualizados pelo delta, sem recarregar todos os itens do pedido
+        pedido.apply_item_delta(qtd_adicionada, valor_adicionado)
+        # Serializa após o flush e antes do commit (que expira os objetos), sem buscar o pedido
+        # de novo: itens existentes da coleção carregada, novos a partir das linhas inseridas
+        db.session.flush()
+        resultado = pedido.to_dict(include_items=True)
+        resultado['itens'] += [PedidoProduto(**linha).to_dict() for linha in novos_itens]
+        db.session.commit()
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
+
+        return {"pedido": resultado, "erros": erros}
+
+    except IntegrityError as e:
+        db.session.rollback()
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao adicionar itens: {e}")
 
 
 def update_item_in_pedido_service(pedido_id, produto_id, item_data):
     """Atualiza um item (quantidade) em um pedido existente."""
     quantidade = item_data.get('quantidade')
     if not quantidade or not isinstance(quantidade, int) or quantidade <= 0:
-        raise ValueError(f"Quantidade inválida ou ausente para atualização.")
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro de validação: Quantidade inválida ou ausente para atualização.")
 
     try:
-        # Busca o item específico na tabela de associação
-        item = PedidoProduto.query.filter_by(pedido_id=pedido_id, produto_id=produto_id).first()
+        # Busca o pedido com os itens e localiza o item específico
+        pedido = _buscar_pedido_com_itens(pedido_id)
+        item = _item_do_pedido(pedido, produto_id) if pedido else None
         if not item:
-            return None, f"Item com Produto ID {produto_id} não encontrado no Pedido ID {pedido_id}."
+            raise APIError(ErrorCode.NOT_FOUND, f"Item com Produto ID {produto_id} não encontrado no Pedido ID {pedido_id}.")
 
         # Atualiza a quantidade
+        qtd_delta = quantidade - item.quantidade
         item.quantidade = quantidade
         # O valor unitário do momento não deve ser alterado aqui
 
-        # Recalcula e atualiza os totais do pedido pai
-        item.pedido.calcular_e_atualizar_totais()
+        # Atualiza os totais do pedido pai pelo delta do item
+        pedido.apply_item_delta(qtd_delta, qtd_delta * item.valor_unitario)
+        # Serializa após o flush e antes do commit (que expira os objetos): o pedido já está
+        # na sessão com os itens carregados, sem precisar buscá-lo de novo
+        db.session.flush()
+        resultado = pedido.to_dict(include_items=True)
         db.session.commit()
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
 
         # Retorna o pedido atualizado com itens
-        return get_pedido_by_id_service(pedido_id, include_items=True)
+        return resultado
 
     except ValueError as ve:
         db.session.rollback()
-        return None, f"Erro de validação: {ve}"
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro de validação: {ve}")
     except IntegrityError as e:
         db.session.rollback()
-        return None, f"Erro de integridade no banco de dados: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        return None, f"Erro de banco de dados ao atualizar item: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar item: {e}")
 
 
 def remove_item_from_pedido_service(pedido_id, produto_id):
     """Remove um item de um pedido existente."""
     try:
-        # Busca o item específico
-        item = PedidoProduto.query.filter_by(pedido_id=pedido_id, produto_id=produto_id).first()
+        # Busca o pedido com os itens e localiza o item específico
+        pedido_pai = _buscar_pedido_com_itens(pedido_id)
+        item = _item_do_pedido(pedido_pai, produto_id) if pedido_pai else None
         if not item:
-            return None, f"Item com Produto ID {produto_id} não encontrado no Pedido ID {pedido_id}."
-
-        # Guarda referência ao pedido pai antes de deletar o item
-        pedido_pai = item.pedido
-
-        # Remove o item
-        db.session.delete(item)
-        # Não precisa fazer commit ainda, recalcular primeiro
-
-        # Recalcula e atualiza os totais do pedido pai
-        # É importante chamar isso *depois* que o item foi marcado para delete na sessão
-        # mas *antes* do commit final. O SQLAlchemy é inteligente o suficiente.
-        pedido_pai.calcular_e_atualizar_totais()
+            raise APIError(ErrorCode.NOT_FOUND, f"Item com Produto ID {produto_id} não encontrado no Pedido ID {pedido_id}.")
+
+        # Remove o item da coleção do pedido (o cascade delete-orphan apaga a linha no flush),
+        # assim os totais e a resposta já refletem a remoção
+        pedido_pai.produtos_associados.remove(item)
+
+        # Desconta o item dos totais do pedido pai
+        pedido_pai.apply_item_delta(-item.quantidade, -(item.quantidade * item.valor_unitario))
+        # Serializa após o flush e antes do commit (que expira os objetos): o pedido já está
+        # na sessão com os itens carregados, sem precisar buscá-lo de novo
+        db.session.flush()
+        resultado = pedido_pai.to_dict(include_items=True)
         db.session.commit()
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
 
         # Retorna o pedido atualizado com itens
-        return get_pedido_by_id_service(pedido_id, include_items=True)
+        return resultado
 
     except IntegrityError as e: # Pouco provável aqui, mas por segurança
         db.session.rollback()
-        return None, f"Erro de integridade no banco de dados: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        return None, f"Erro de banco de dados ao remover item: {e}"
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao remover item: {e}")
 
 
 # --- Serviços de Atualização/Exclusão de Pedido ---
@@ -360,12 +674,12 @@ def remove_item_from_pedido_service(pedido_id, produto_id):
 def patch_pedido_service(pedido_id, pedido_data):
     """Atualiza parcialmente um pedido (ex: email, endereco_entrega)."""
     if not pedido_data:
-        return None, "Erro: Nenhum dado fornecido para atualização (PATCH)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum dado fornecido para atualização (PATCH).")
 
     try:
-        pedido = Pedido.query.get(pedido_id)
+        pedido = db.session.get(Pedido, pedido_id)
         if not pedido:
-            return None, "Erro: Pedido não encontrado."
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Pedido não encontrado.")
 
         updated = False
         # Campos permitidos para PATCH no pedido principal (não os itens)
@@ -376,29 +690,37 @@ def patch_pedido_service(pedido_id, pedido_data):
                 updated = True
 
         if not updated:
-            return None, "Erro: Nenhum campo válido fornecido para atualização (PATCH)."
+            raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum campo válido fornecido para atualização (PATCH).")
 
         db.session.commit()
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
         # Retorna o pedido atualizado (sem itens por padrão no PATCH)
-        return pedido.to_dict(include_items=False), None
+        return pedido.to_dict(include_items=False)
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao atualizar pedido (PATCH): {e}")
-        return None, f"Erro de banco de dados ao atualizar pedido: {e}"
+        log.exception("Erro SQLAlchemy ao atualizar pedido (PATCH)")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar pedido: {e}")
 
 
 def delete_pedido_service(pedido_id):
-    """Deleta um pedido e seus itens associados (devido ao cascade)."""
+    """
+    Deleta um pedido com um único DELETE, sem carregar o pedido nem os itens na sessão;
+    os itens são removidos pelo ON DELETE CASCADE da chave estrangeira. rowcount 0 significa 404.
+    """
     try:
-        pedido = Pedido.query.get(pedido_id)
-        if not pedido:
-            return None, "Erro: Pedido não encontrado."
-
-        db.session.delete(pedido)
+        result = db.session.execute(
+            delete(Pedido).where(Pedido.id == pedido_id).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Pedido não encontrado.")
         db.session.commit()
-        return {"message": f"Pedido com ID {pedido_id} e seus itens foram deletados com sucesso."}, None
+        _invalidar_cache_listagem()
+        _invalidar_cache_pedido(pedido_id)
+        return {"message": f"Pedido com ID {pedido_id} e seus itens foram deletados com sucesso."}
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao deletar pedido: {e}")
-        return None, f"Erro de banco de dados ao deletar pedido: {e}"
+        log.exception("Erro SQLAlchemy ao deletar pedido")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao deletar pedido: {e}")
 
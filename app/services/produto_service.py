@@ -1,51 +1,92 @@
 # ./app/services/produto_service.py
 # Contém a lógica de negócio para a entidade Produto, usando SQLAlchemy.
+# Os serviços retornam o resultado diretamente e levantam APIError (com um ErrorCode) em caso de erro.
 
+import logging
+import re
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy import func # Para usar funções como ilike
-from decimal import Decimal, InvalidOperation # Para lidar com o tipo Numeric/Decimal
-from app import db
+from sqlalchemy import delete, func, select # Para usar funções como ilike
+from decimal import Decimal # Para lidar com o tipo Numeric/Decimal
+from app import db, cache, BATCH_MAX, YIELD_PER
+from app.errors import APIError, ErrorCode, unique_violation_key
 from app.models.produto import Produto # Importa o modelo Produto
 
+log = logging.getLogger(__name__)
+
+# Número finito em texto, no formato aceito por Decimal (ex: "10", "-3.50", ".5", "1e3")
+_DECIMAL_RE = re.compile(r'\s*[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?\s*')
+
+def _to_decimal(value):
+    """
+    Converte um valor recebido (número ou texto) para Decimal; None se não for um número finito.
+    Textos são conferidos pela regex antes de criar o Decimal, em vez de lançar e capturar
+    InvalidOperation a cada valor inválido. NaN/Infinity não chegam ao banco.
+    """
+    if isinstance(value, (Decimal, int)):
+        return Decimal(value)
+    if isinstance(value, float):
+        valor = Decimal(value)
+        return valor if valor.is_finite() else None
+    if isinstance(value, str) and _DECIMAL_RE.fullmatch(value):
+        return Decimal(value)
+    return None
+
+# Chaves únicas do EAN (nome no MySQL/SQLite ou constraint do PostgreSQL)
+_EAN_KEYS = {'ean', 'produto_ean_key'}
+
+def _erro_de_unicidade(e, produto_data, motivo):
+    """APIError para um IntegrityError de EAN duplicado, ou None se não for de unicidade."""
+    chave = unique_violation_key(e)
+    if chave is None:
+        return None
+    if chave in _EAN_KEYS and produto_data.get('ean'):
+        return APIError(ErrorCode.DUP_OR_INVALID, f"Erro: EAN '{produto_data.get('ean')}' {motivo}")
+    return APIError(ErrorCode.DUP_OR_INVALID, "Erro: Violação de restrição de unicidade (EAN).")
+
 def _build_sqlalchemy_filters(query, filters):
-    """Aplica filtros SQLAlchemy a uma query de Produto."""
-    allowed_filters = ['nome', 'ean', 'valor_min', 'valor_max'] # Filtros permitidos
-
-    for key, value in filters.items():
-        if key in allowed_filters and value is not None: # Verifica se tem valor
-            model_attr = getattr(Produto, key.split('_')[0], None) # Pega 'nome', 'ean', 'valor'
-
-            if key == 'nome' and model_attr:
-                query = query.filter(model_attr.ilike(f"%{value}%"))
-            elif key == 'ean' and model_attr:
-                query = query.filter(model_attr == value) # Busca exata para EAN
-            elif key == 'valor_min' and model_attr:
-                try:
-                    valor_min_decimal = Decimal(value)
-                    query = query.filter(Produto.valor >= valor_min_decimal)
-                except InvalidOperation:
-                    pass # Ignora filtro se o valor for inválido
-            elif key == 'valor_max' and model_attr:
-                try:
-                    valor_max_decimal = Decimal(value)
-                    query = query.filter(Produto.valor <= valor_max_decimal)
-                except InvalidOperation:
-                    pass # Ignora filtro se o valor for inválido
+    """
+    Aplica filtros SQLAlchemy a uma query de Produto (tudo vira WHERE no banco).
+    A faixa de valor vira um único BETWEEN quando os dois limites são informados (índice em valor).
+    """
+    nome = filters.get('nome')
+    if nome:
+        query = query.filter(Produto.nome.ilike(f"%{nome}%"))
+    ean = filters.get('ean')
+    if ean:
+        query = query.filter(Produto.ean == ean) # Busca exata para EAN
+
+    valor_min = _to_decimal(filters['valor_min']) if filters.get('valor_min') else None
+    valor_max = _to_decimal(filters['valor_max']) if filters.get('valor_max') else None
+    if valor_min is not None and valor_max is not None:
+        query = query.filter(Produto.valor.between(valor_min, valor_max))
+    elif valor_min is not None:
+        query = query.filter(Produto.valor >= valor_min)
+    elif valor_max is not None:
+        query = query.filter(Produto.valor <= valor_max)
     return query
 
+def _invalidar_cache_listagem():
+    """Descarta as listagens/contagens memoizadas (chamado após cada escrita confirmada)."""
+    cache.delete_memoized(get_all_produtos_service)
+    cache.delete_memoized(count_produtos_service)
+
+@cache.memoize()
 def get_all_produtos_service(filters=None):
     """Busca todos os produtos, aplicando filtros opcionais."""
     try:
         query = Produto.query
         if filters:
             query = _build_sqlalchemy_filters(query, filters)
-        produtos = query.all()
-        return [produto.to_dict() for produto in produtos], None
+        # A listagem é memoizada (e serializada com ETag), então precisa ser uma lista; yield_per
+        # busca os produtos em lotes e cada lote de instâncias pode ser liberado após virar dict,
+        # em vez de manter a lista de objetos inteira e a de dicts ao mesmo tempo
+        return [produto.to_dict() for produto in query.yield_per(YIELD_PER)]
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar produtos: {e}")
-        return None, f"Erro de banco de dados ao buscar produtos: {e}"
+        log.exception("Erro SQLAlchemy ao buscar produtos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar produtos: {e}")
 
+@cache.memoize()
 def count_produtos_service(filters=None):
     """Conta o número total de produtos, aplicando filtros opcionais."""
     try:
@@ -56,36 +97,40 @@ def count_produtos_service(filters=None):
             count = count_query.count()
         else:
             count = query.scalar()
-        return count, None
+        return count
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao contar produtos: {e}")
-        return None, f"Erro de banco de dados ao contar produtos: {e}"
+        log.exception("Erro SQLAlchemy ao contar produtos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao contar produtos: {e}")
 
 def get_produto_by_id_service(produto_id):
     """Busca um produto específico pelo seu ID."""
     try:
-        produto = Produto.query.get(produto_id)
+        produto = db.session.get(Produto, produto_id)
         if produto:
-            return produto.to_dict(), None
+            return produto.to_dict()
         else:
-            return None, None
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Produto não encontrado.")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao buscar produto por ID: {e}")
-        return None, f"Erro de banco de dados ao buscar produto por ID: {e}"
+        log.exception("Erro SQLAlchemy ao buscar produto por ID")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao buscar produto por ID: {e}")
 
-def create_produto_service(produto_data):
-    """Cria um novo produto."""
+def _validar_novo_produto(produto_data):
+    """Valida os campos de criação de um produto. Retorna o valor convertido para Decimal."""
     required_fields = ['nome', 'valor']
     if not all(field in produto_data and produto_data[field] is not None for field in required_fields):
-        return None, "Erro: Campos obrigatórios ausentes ou vazios (nome, valor)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Campos obrigatórios ausentes ou vazios (nome, valor).")
 
-    try:
-        # Converte valor para Decimal
-        valor_decimal = Decimal(produto_data['valor'])
-    except (InvalidOperation, TypeError):
-        return None, "Erro: Valor inválido. Deve ser um número."
+    # Converte valor para Decimal
+    valor_decimal = _to_decimal(produto_data['valor'])
+    if valor_decimal is None:
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Valor inválido. Deve ser um número.")
+    return valor_decimal
+
+def create_produto_service(produto_data):
+    """Cria um novo produto."""
+    valor_decimal = _validar_novo_produto(produto_data)
 
     novo_produto = Produto(
         nome=produto_data['nome'],
@@ -96,66 +141,124 @@ def create_produto_service(produto_data):
     try:
         db.session.add(novo_produto)
         db.session.commit()
-        return novo_produto.to_dict(), None
+        _invalidar_cache_listagem()
+        return novo_produto.to_dict()
+    except IntegrityError as e:
+        db.session.rollback()
+        log.warning("Erro de Integridade ao criar produto: %s", e)
+        erro = _erro_de_unicidade(e, produto_data, "já cadastrado.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        log.exception("Erro SQLAlchemy ao criar produto")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar produto: {e}")
+
+def create_produtos_batch_service(produtos_data):
+    """
+    Cria vários produtos em uma única transação (um commit para o lote todo).
+    Itens inválidos ou com EAN já cadastrado/repetido no lote são devolvidos em 'erros',
+    com o índice no lote; os demais são criados.
+    """
+    if len(produtos_data) > BATCH_MAX:
+        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro: O lote excede o limite de {BATCH_MAX} registros.")
+
+    erros = []
+    validos = [] # (indice, dados, valor_decimal)
+    for indice, produto_data in enumerate(produtos_data):
+        if not isinstance(produto_data, dict):
+            erros.append({"indice": indice, "message": "Erro: Formato inválido para produto."})
+            continue
+        try:
+            valor_decimal = _validar_novo_produto(produto_data)
+        except APIError as e:
+            erros.append({"indice": indice, "message": e.message})
+            continue
+        validos.append((indice, produto_data, valor_decimal))
+
+    try:
+        # EANs já cadastrados: uma única consulta IN em vez de uma por item
+        eans = {produto_data['ean'] for _, produto_data, _ in validos if produto_data.get('ean')}
+        existentes = set(db.session.scalars(select(Produto.ean).where(Produto.ean.in_(eans)))) if eans else set()
+
+        novos_produtos = []
+        vistos = set()
+        for indice, produto_data, valor_decimal in validos:
+            ean = produto_data.get('ean')
+            if ean in existentes:
+                erros.append({"indice": indice, "message": f"Erro: EAN '{ean}' já cadastrado."})
+                continue
+            if ean in vistos:
+                erros.append({"indice": indice, "message": f"Erro: EAN '{ean}' repetido no lote."})
+                continue
+            if ean:
+                vistos.add(ean)
+            novos_produtos.append(Produto(nome=produto_data['nome'], valor=valor_decimal, ean=ean))
+
+        db.session.add_all(novos_produtos)
+        # Serializa após o flush (IDs gerados) e antes do commit, que expira os objetos
+        db.session.flush()
+        criados = [produto.to_dict() for produto in novos_produtos]
+        db.session.commit()
+        if criados:
+            _invalidar_cache_listagem()
+        erros.sort(key=lambda erro: erro["indice"])
+        return {"criados": criados, "erros": erros}
     except IntegrityError as e:
+        # Ex: EAN inserido por outra requisição entre a verificação e o commit
         db.session.rollback()
-        print(f"Erro de Integridade ao criar produto: {e}")
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            # Verifica se foi o EAN (único campo unique além do ID)
-            if produto_data.get('ean') and f"'{produto_data.get('ean')}'" in str(e):
-                return None, f"Erro: EAN '{produto_data.get('ean')}' já cadastrado."
-            return None, "Erro: Violação de restrição de unicidade (EAN)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao criar lote de produtos: %s", e)
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Violação de restrição de unicidade (EAN).")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao criar produto: {e}")
-        return None, f"Erro de banco de dados ao criar produto: {e}"
+        log.exception("Erro SQLAlchemy ao criar lote de produtos")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao criar lote de produtos: {e}")
 
 def update_produto_service(produto_id, produto_data):
     """Atualiza todos os dados de um produto (PUT)."""
     required_fields = ['nome', 'valor', 'ean'] # Exige todos para PUT (ean pode ser None)
     if not all(field in produto_data for field in required_fields):
-        return None, "Erro: Para PUT, todos os campos devem ser enviados (nome, valor, ean)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Para PUT, todos os campos devem ser enviados (nome, valor, ean).")
 
-    try:
-        # Converte valor para Decimal
-        valor_decimal = Decimal(produto_data['valor'])
-    except (InvalidOperation, TypeError):
-        return None, "Erro: Valor inválido. Deve ser um número."
+    # Converte valor para Decimal
+    valor_decimal = _to_decimal(produto_data['valor'])
+    if valor_decimal is None:
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Valor inválido. Deve ser um número.")
 
     try:
-        produto = Produto.query.get(produto_id)
+        produto = db.session.get(Produto, produto_id)
         if not produto:
-            return None, "Erro: Produto não encontrado."
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Produto não encontrado.")
 
         produto.nome = produto_data['nome']
         produto.valor = valor_decimal
         produto.ean = produto_data.get('ean')
 
         db.session.commit()
-        return produto.to_dict(), None
+        _invalidar_cache_listagem()
+        return produto.to_dict()
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao atualizar produto (PUT): {e}")
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            if produto_data.get('ean') and f"'{produto_data.get('ean')}'" in str(e):
-                return None, f"Erro: EAN '{produto_data.get('ean')}' já pertence a outro produto."
-            return None, "Erro: Violação de restrição de unicidade (EAN)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao atualizar produto (PUT): %s", e)
+        erro = _erro_de_unicidade(e, produto_data, "já pertence a outro produto.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao atualizar produto (PUT): {e}")
-        return None, f"Erro de banco de dados ao atualizar produto: {e}"
+        log.exception("Erro SQLAlchemy ao atualizar produto (PUT)")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar produto: {e}")
 
 def patch_produto_service(produto_id, produto_data):
     """Atualiza parcialmente um produto (PATCH)."""
     if not produto_data:
-        return None, "Erro: Nenhum dado fornecido para atualização (PATCH)."
+        raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum dado fornecido para atualização (PATCH).")
 
     try:
-        produto = Produto.query.get(produto_id)
+        produto = db.session.get(Produto, produto_id)
         if not produto:
-            return None, "Erro: Produto não encontrado."
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Produto não encontrado.")
 
         updated = False
         allowed_fields = ['nome', 'valor', 'ean']
@@ -163,55 +266,56 @@ def patch_produto_service(produto_id, produto_data):
             if key in allowed_fields and hasattr(produto, key):
                 if key == 'valor':
                     # Trata a conversão para Decimal no PATCH também
-                    try:
-                        setattr(produto, key, Decimal(value))
-                    except (InvalidOperation, TypeError):
-                        return None, f"Erro: Valor inválido para o campo '{key}'. Deve ser um número."
+                    valor_decimal = _to_decimal(value)
+                    if valor_decimal is None:
+                        raise APIError(ErrorCode.DUP_OR_INVALID, f"Erro: Valor inválido para o campo '{key}'. Deve ser um número.")
+                    setattr(produto, key, valor_decimal)
                 else:
                     setattr(produto, key, value)
                 updated = True
 
         if not updated:
-            return None, "Erro: Nenhum campo válido fornecido para atualização (PATCH)."
+            raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Nenhum campo válido fornecido para atualização (PATCH).")
 
         db.session.commit()
-        return produto.to_dict(), None
+        _invalidar_cache_listagem()
+        return produto.to_dict()
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao atualizar produto (PATCH): {e}")
-        if 'UNIQUE constraint failed' in str(e) or 'Duplicate entry' in str(e):
-            if 'ean' in produto_data and f"'{produto_data.get('ean')}'" in str(e):
-                return None, f"Erro: EAN '{produto_data.get('ean')}' já pertence a outro produto."
-            return None, "Erro: Violação de restrição de unicidade (EAN)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao atualizar produto (PATCH): %s", e)
+        erro = _erro_de_unicidade(e, produto_data, "já pertence a outro produto.")
+        if erro:
+            raise erro
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao atualizar produto (PATCH): {e}")
-        return None, f"Erro de banco de dados ao atualizar produto: {e}"
+        log.exception("Erro SQLAlchemy ao atualizar produto (PATCH)")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao atualizar produto: {e}")
 
 def delete_produto_service(produto_id):
-    """Deleta um produto."""
+    """
+    Deleta um produto com um único DELETE (sem SELECT prévio); rowcount 0 significa 404.
+    Itens de pedido que referenciam o produto fazem o banco recusar a exclusão (chave estrangeira).
+    """
     try:
-        produto = Produto.query.get(produto_id)
-        if not produto:
-            return None, "Erro: Produto não encontrado."
-
-        # Adicionar verificação de dependência (ex: PedidoProduto) antes de deletar
-        # from app.models.pedido import PedidoProduto # Exemplo
-        # if PedidoProduto.query.filter_by(produto_id=produto_id).first():
-        #     return None, "Erro: Não é possível excluir produto pois ele está associado a pedidos."
-
-        db.session.delete(produto)
+        result = db.session.execute(
+            delete(Produto).where(Produto.id == produto_id).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            raise APIError(ErrorCode.NOT_FOUND, "Erro: Produto não encontrado.")
         db.session.commit()
-        return {"message": f"Produto com ID {produto_id} deletado com sucesso."}, None
+        _invalidar_cache_listagem()
+        return {"message": f"Produto com ID {produto_id} deletado com sucesso."}
     except IntegrityError as e:
         db.session.rollback()
-        print(f"Erro de Integridade ao deletar produto: {e}")
-        if 'FOREIGN KEY constraint fails' in str(e):
-            return None, "Erro: Não é possível excluir produto pois ele possui registros dependentes (ex: itens de pedido)."
-        return None, f"Erro de integridade no banco de dados: {e}"
+        log.warning("Erro de Integridade ao deletar produto: %s", e)
+        # MySQL: "a foreign key constraint fails"; SQLite: "FOREIGN KEY constraint failed"
+        if 'foreign key constraint fail' in str(e).lower():
+            raise APIError(ErrorCode.DUP_OR_INVALID, "Erro: Não é possível excluir produto pois ele possui registros dependentes (ex: itens de pedido).")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de integridade no banco de dados: {e}")
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro SQLAlchemy ao deletar produto: {e}")
-        return None, f"Erro de banco de dados ao deletar produto: {e}"
+        log.exception("Erro SQLAlchemy ao deletar produto")
+        raise APIError(ErrorCode.INTERNAL, f"Erro de banco de dados ao deletar produto: {e}")
 
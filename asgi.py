@@ -0,0 +1,14 @@
+# ./asgi.py
+# Ponto de entrada ASGI: expõe a app Flask (WSGI) para servidores ASGI, ex:
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:asgi_app
+#
+# Os controllers e serviços continuam síncronos (SQLAlchemy com driver MySQL síncrono).
+# O WsgiToAsgi executa cada requisição em uma thread, mas o executor padrão do asgiref é
+# compartilhado por processo: a concorrência continua vindo do número de workers. Útil para
+# integrar a API a uma stack ASGI; para vazão, o servidor WSGI com threads segue sendo o caminho.
+
+from asgiref.wsgi import WsgiToAsgi
+
+from run import app
+
+asgi_app = WsgiToAsgi(app)
@@ -0,0 +1,29 @@
+"""ON DELETE CASCADE em pedido_produto.pedido_id
+
+Revision ID: c83b5f20e1a4
+Revises: a41f0d6e9c27
+Create Date: 2025-05-17 09:31:44.207816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83b5f20e1a4'
+down_revision = 'a41f0d6e9c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A chave estrangeira foi criada sem nome; o MySQL a nomeou pedido_produto_ibfk_1
+    with op.batch_alter_table('pedido_produto', schema=None) as batch_op:
+        batch_op.drop_constraint('pedido_produto_ibfk_1', type_='foreignkey')
+        batch_op.create_foreign_key('fk_pedido_produto_pedido_id', 'pedido', ['pedido_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('pedido_produto', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_pedido_produto_pedido_id', type_='foreignkey')
+        batch_op.create_foreign_key('pedido_produto_ibfk_1', 'pedido', ['pedido_id'], ['id'])
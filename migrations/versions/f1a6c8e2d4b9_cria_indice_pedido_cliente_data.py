@@ -0,0 +1,37 @@
+"""Cria indice composto em pedido (cliente_id, data_criacao)
+
+Revision ID: f1a6c8e2d4b9
+Revises: e5b19d3a7f62
+Create Date: 2025-05-12 09:27:51.640318
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6c8e2d4b9'
+down_revision = 'e5b19d3a7f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pedido', schema=None) as batch_op:
+        batch_op.create_index('ix_pedido_cliente_data', ['cliente_id', 'data_criacao'], unique=False)
+
+    # O índice composto (cliente_id na frente) passa a sustentar a chave estrangeira de cliente_id;
+    # o índice simples deixado por um downgrade anterior fica redundante (no modo --sql não há
+    # conexão para inspecionar, então ele é mantido)
+    if not context.is_offline_mode() and 'ix_pedido_cliente_id' in {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('pedido')}:
+        with op.batch_alter_table('pedido', schema=None) as batch_op:
+            batch_op.drop_index('ix_pedido_cliente_id')
+
+
+def downgrade():
+    # No MySQL (InnoDB) o índice implícito da chave estrangeira de cliente_id é descartado quando
+    # o índice composto é criado; sem um índice em cliente_id, o DROP INDEX falha (erro 1553).
+    # Cria antes um índice simples em cliente_id para sustentar a chave estrangeira.
+    with op.batch_alter_table('pedido', schema=None) as batch_op:
+        batch_op.create_index('ix_pedido_cliente_id', ['cliente_id'], unique=False)
+        batch_op.drop_index('ix_pedido_cliente_data')
@@ -2,24 +2,37 @@
 # Ponto de entrada principal para iniciar a aplicação Flask.
 
 import os
-from dotenv import load_dotenv
+import logging
 
 # Carrega as variáveis de ambiente do arquivo .env
 # Isso garante que as configurações (DB, API_KEY) estejam disponíveis
-load_dotenv()
+# Em produção (FLASK_ENV=production) as variáveis vêm do ambiente (docker-compose/orquestrador):
+# o .env não é lido e o dotenv nem é importado.
+if os.environ.get('FLASK_ENV') != 'production':
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Handler dos logs dos serviços (logging.getLogger(__name__)); nível por LOG_LEVEL, INFO por padrão.
+# As mensagens só são formatadas se o nível estiver habilitado.
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
 
 # Importa a função create_app de dentro do pacote 'app'
 # A importação é feita DEPOIS de carregar o .env
 from app import create_app
 
 # Cria a instância da aplicação Flask chamando a fábrica
+# Uma única instância por processo, no escopo do módulo (wsgi.py e asgi.py reaproveitam esta)
 app = create_app()
 
 if __name__ == '__main__':
+    # O servidor embutido do Flask (Werkzeug) é só para desenvolvimento.
+    # Em produção a app é servida pelo Gunicorn a partir do wsgi.py.
+    if os.environ.get('FLASK_ENV') != 'development':
+        raise SystemExit("Use o gunicorn: gunicorn wsgi:app -w 4 -k gthread --threads 4 --preload -b 0.0.0.0:5000")
     # Obtém a porta da variável de ambiente ou usa 5000 como padrão
     port = int(os.environ.get('PORT', 5000))
-    # Executa a aplicação
     # host='0.0.0.0' torna a API acessível externamente (necessário para Docker)
-    # debug=True é útil para desenvolvimento, mas deve ser False em produção
-    # O modo debug é geralmente controlado pela variável FLASK_ENV no .env/docker-compose
-    app.run(host='0.0.0.0', port=port, debug=(os.environ.get('FLASK_ENV') == 'development'))
+    app.run(host='0.0.0.0', port=port, debug=True)
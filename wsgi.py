@@ -0,0 +1,10 @@
+# ./wsgi.py
+# Ponto de entrada WSGI para o servidor de produção (Gunicorn), ex:
+#   gunicorn wsgi:app -w 4 -k gthread --threads 4 --preload -b 0.0.0.0:5000
+#
+# Com --preload a app é criada uma vez no master e herdada pelos workers (copy-on-write).
+# Nenhuma conexão com o banco é aberta na criação da app, então o pool não é compartilhado entre processos.
+
+from run import app
+
+__all__ = ['app']